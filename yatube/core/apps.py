@@ -1,5 +1,21 @@
 from django.apps import AppConfig
+from django.contrib.auth import get_user_model
+from django.core.signals import request_finished
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from .auth import invalidate
+        from .cache import clear_caches
+        from .db import configure_sqlite
+        from .sessions import flush_due
+        from . import mail  # noqa: F401
+        post_migrate.connect(clear_caches, sender=self)
+        connection_created.connect(configure_sqlite)
+        request_finished.connect(flush_due)
+        post_save.connect(invalidate, sender=get_user_model())
+        post_delete.connect(invalidate, sender=get_user_model())
@@ -0,0 +1,59 @@
+"""Пользователь запроса из кэша.
+
+django.contrib.auth.get_user читает пользователя из базы на каждом
+запросе. Здесь пользователь кэшируется по id вместе с хэшем сессии
+(get_session_auth_hash) на AUTH_USER_CACHE_TIMEOUT секунд и берётся из
+кэша, пока хэш совпадает с сохранённым в сессии. Запись сбрасывается
+при любом сохранении или удалении пользователя — в том числе при смене
+пароля, после которой старые сессии перестают совпадать по хэшу.
+"""
+from django.conf import settings
+from django.contrib import auth
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
+
+USER_KEY = 'auth:user:{}'
+
+
+def get_user(request):
+    """django.contrib.auth.get_user с пользователем из кэша."""
+    session = request.session
+    user_id = session.get(auth.SESSION_KEY)
+    backend_path = session.get(auth.BACKEND_SESSION_KEY)
+    session_hash = session.get(auth.HASH_SESSION_KEY)
+    if (user_id is not None and session_hash
+            and backend_path in settings.AUTHENTICATION_BACKENDS):
+        cached = cache.get(USER_KEY.format(user_id))
+        if cached is not None:
+            user_hash, user = cached
+            if constant_time_compare(session_hash, user_hash):
+                return user
+    # Промах или хэш не совпал: get_user проверит сессию по базе и при
+    # несовпадении завершит её.
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        cache.set(
+            USER_KEY.format(user.pk),
+            (user.get_session_auth_hash(), user),
+            settings.AUTH_USER_CACHE_TIMEOUT
+        )
+    return user
+
+
+def is_trusted(request, secret, token, allowed_ips):
+    """Доступ к служебным страницам: персоналу сайта или с адреса из
+    allowed_ips, если запрос предъявил secret, равный token.
+
+    Одному адресу не доверяется: за обратным прокси все запросы
+    приходят с 127.0.0.1.
+    """
+    if (token and secret
+            and request.META.get('REMOTE_ADDR') in allowed_ips
+            and constant_time_compare(secret, token)):
+        return True
+    return request.user.is_staff
+
+
+def invalidate(sender, instance, **kwargs):
+    """Обработчик post_save и post_delete пользователя."""
+    cache.delete(USER_KEY.format(instance.pk))
@@ -0,0 +1,435 @@
+"""Двухуровневый кэш для нескольких процессов одного хоста.
+
+L1 — ограниченный LRU-словарь в памяти процесса, L2 — общий файл
+SQLite. Каждая запись в L2 попадает в журнал инвалидаций; процессы
+раз в POLL_INTERVAL секунд читают из него ключи, изменённые другими,
+и выбрасывают их из своего L1.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from . import metrics
+
+CLEAR_ALL = '*'
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)',
+    'CREATE TABLE IF NOT EXISTS invalidations ('
+    ' seq INTEGER PRIMARY KEY AUTOINCREMENT,'
+    ' key TEXT NOT NULL, origin TEXT NOT NULL, created REAL NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS stats ('
+    ' origin TEXT, tier TEXT, hits INTEGER NOT NULL,'
+    ' misses INTEGER NOT NULL, PRIMARY KEY (origin, tier))',
+)
+
+
+def _expired(expires, now):
+    return expires is not None and expires <= now
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite, общий для всех процессов хоста."""
+
+    cull_every = 100
+    log_ttl = 300
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def origin(self):
+        # Свои записи процесс в L1 уже учёл, из журнала их не читает.
+        return str(os.getpid())
+
+    @property
+    def connection(self):
+        # Соединение своё у каждого потока и каждого процесса после fork.
+        if getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(
+                self.path, timeout=10, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    def _write(self, statements, keys):
+        """Выполняет изменения и запись в журнал одной транзакцией."""
+        connection = self.connection
+        now = time.time()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            result = [
+                connection.execute(*statement) for statement in statements
+            ]
+            connection.executemany(
+                'INSERT INTO invalidations (key, origin, created) '
+                'VALUES (?, ?, ?)',
+                [(key, self.origin, now) for key in keys]
+            )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        self._writes += 1
+        if self._writes % self.cull_every == 0:
+            self._cull(now)
+        return result
+
+    def _cull(self, now):
+        connection = self.connection
+        connection.execute(
+            'DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?',
+            (now,)
+        )
+        connection.execute(
+            'DELETE FROM invalidations WHERE created < ?',
+            (now - self.log_ttl,)
+        )
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            connection.execute(
+                'DELETE FROM cache WHERE key IN ('
+                ' SELECT key FROM cache'
+                ' ORDER BY expires IS NULL, expires LIMIT ?)',
+                (count // self._cull_frequency,)
+            )
+
+    # Операции над уже подготовленными ключами, значения — pickle.
+
+    def get_raw(self, keys):
+        """{ключ: (значение, срок)} для действующих записей."""
+        if not keys:
+            return {}
+        now = time.time()
+        rows = self.connection.execute(
+            'SELECT key, value, expires FROM cache WHERE key IN (%s)'
+            % ', '.join('?' * len(keys)),
+            list(keys)
+        )
+        return {
+            key: (value, expires)
+            for key, value, expires in rows if not _expired(expires, now)
+        }
+
+    def set_raw(self, items):
+        """Записывает {ключ: (значение, срок)}."""
+        self._write(
+            [
+                (
+                    'INSERT OR REPLACE INTO cache (key, value, expires) '
+                    'VALUES (?, ?, ?)',
+                    (key, value, expires)
+                )
+                for key, (value, expires) in items.items()
+            ],
+            items
+        )
+
+    def add_raw(self, key, value, expires):
+        _, added = self._write(
+            [
+                (
+                    'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                    (key, time.time())
+                ),
+                (
+                    'INSERT OR IGNORE INTO cache (key, value, expires) '
+                    'VALUES (?, ?, ?)',
+                    (key, value, expires)
+                ),
+            ],
+            [key]
+        )
+        return added.rowcount > 0
+
+    def delete_raw(self, keys):
+        (deleted,) = self._write(
+            [(
+                'DELETE FROM cache WHERE key IN (%s)'
+                % ', '.join('?' * len(keys)),
+                list(keys)
+            )],
+            keys
+        )
+        return deleted.rowcount > 0
+
+    def incr_raw(self, key, delta):
+        """Атомарно меняет число, возвращает (значение, pickle, срок)."""
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or _expired(row[1], time.time()):
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?', (pickled, key)
+            )
+            connection.execute(
+                'INSERT INTO invalidations (key, origin, created) '
+                'VALUES (?, ?, ?)',
+                (key, self.origin, time.time())
+            )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return value, pickled, row[1]
+
+    def changes(self, after):
+        """Ключи, изменённые другими процессами после записи after журнала.
+
+        Возвращает (последний номер, ключи, есть ли пропуск): пропуск
+        значит, что журнал уже подрезан и часть изменений потеряна.
+        """
+        rows = self.connection.execute(
+            'SELECT seq, key, origin FROM invalidations WHERE seq > ? '
+            'ORDER BY seq',
+            (after,)
+        ).fetchall()
+        if not rows:
+            return after, set(), False
+        # Записи журнала идут подряд, пока его не подрезали.
+        gap = rows[0][0] > after + 1
+        keys = {key for _, key, origin in rows if origin != self.origin}
+        return rows[-1][0], keys, gap
+
+    def last_change(self):
+        row = self.connection.execute(
+            'SELECT MAX(seq) FROM invalidations'
+        ).fetchone()
+        return row[0] or 0
+
+    def save_stats(self, origin, counters):
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO stats (origin, tier, hits, misses) '
+            'VALUES (?, ?, ?, ?)',
+            [
+                (origin, tier, counters[f'{tier}_hits'],
+                 counters[f'{tier}_misses'])
+                for tier in ('l1', 'l2')
+            ]
+        )
+
+    def load_stats(self):
+        """Попадания и промахи по уровням, сложенные по всем процессам."""
+        return {
+            tier: (hits, misses)
+            for tier, hits, misses in self.connection.execute(
+                'SELECT tier, SUM(hits), SUM(misses) FROM stats GROUP BY tier'
+            )
+        }
+
+    # Интерфейс BaseCache.
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _dump(self, value, timeout):
+        return (
+            pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+            self.get_backend_timeout(timeout),
+        )
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.add_raw(
+            self._key(key, version), *self._dump(value, timeout)
+        )
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        found = self.get_raw([key])
+        if key not in found:
+            return default
+        return pickle.loads(found[key][0])
+
+    def get_many(self, keys, version=None):
+        made = {self._key(key, version): key for key in keys}
+        return {
+            made[key]: pickle.loads(value)
+            for key, (value, _) in self.get_raw(list(made)).items()
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_raw({self._key(key, version): self._dump(value, timeout)})
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        if data:
+            self.set_raw({
+                self._key(key, version): self._dump(value, timeout)
+                for key, value in data.items()
+            })
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        found = self.get_raw([key])
+        if key not in found:
+            return False
+        self.set_raw({key: (found[key][0], self.get_backend_timeout(timeout))})
+        return True
+
+    def delete(self, key, version=None):
+        return self.delete_raw([self._key(key, version)])
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self.delete_raw(keys)
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return key in self.get_raw([key])
+
+    def incr(self, key, delta=1, version=None):
+        return self.incr_raw(self._key(key, version), delta)[0]
+
+    def clear(self):
+        self._write([('DELETE FROM cache',)], [CLEAR_ALL])
+
+
+class L1:
+    """LRU-словарь процесса, общий для экземпляров кэша во всех потоках
+    (Django создаёт свой экземпляр бэкенда на каждый поток)."""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        self.saved_stats = Counter()
+        self.seq = None
+        self.polled = 0
+
+
+_l1s = {}
+_l1s_lock = threading.Lock()
+
+
+class TwoTierCache(SQLiteCache):
+    """SQLiteCache с LRU-кэшем процесса перед ним.
+
+    OPTIONS: L1_MAX_ENTRIES — размер L1, POLL_INTERVAL — как часто
+    (в секундах) читать журнал инвалидаций.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        options = params.get('OPTIONS', {})
+        self.l1_max_entries = options.get('L1_MAX_ENTRIES', 1000)
+        self.poll_interval = options.get('POLL_INTERVAL', 1)
+        with _l1s_lock:
+            self.l1 = _l1s.setdefault(location, L1())
+            if self.l1.seq is None:
+                self.l1.seq = self.last_change()
+
+    def _sync(self):
+        l1 = self.l1
+        now = time.monotonic()
+        if now - l1.polled < self.poll_interval:
+            return
+        l1.polled = now
+        l1.seq, keys, gap = self.changes(l1.seq)
+        with l1.lock:
+            if gap or CLEAR_ALL in keys:
+                l1.entries.clear()
+            else:
+                for key in keys:
+                    l1.entries.pop(key, None)
+        if l1.stats != l1.saved_stats:
+            l1.saved_stats = l1.stats.copy()
+            self.save_stats(self.origin, l1.saved_stats)
+
+    def _remember(self, items):
+        entries = self.l1.entries
+        with self.l1.lock:
+            for key, entry in items.items():
+                entries[key] = entry
+                entries.move_to_end(key)
+            while len(entries) > self.l1_max_entries:
+                entries.popitem(last=False)
+
+    def _forget(self, keys):
+        with self.l1.lock:
+            for key in keys:
+                self.l1.entries.pop(key, None)
+
+    def get_raw(self, keys):
+        self._sync()
+        now = time.time()
+        found = {}
+        entries = self.l1.entries
+        with self.l1.lock:
+            for key in keys:
+                entry = entries.get(key)
+                if entry is None or _expired(entry[1], now):
+                    continue
+                entries.move_to_end(key)
+                found[key] = entry
+        missing = [key for key in keys if key not in found]
+        stats = self.l1.stats
+        stats['l1_hits'] += len(found)
+        stats['l1_misses'] += len(missing)
+        if missing:
+            loaded = super().get_raw(missing)
+            stats['l2_hits'] += len(loaded)
+            stats['l2_misses'] += len(missing) - len(loaded)
+            self._remember(loaded)
+            found.update(loaded)
+        metrics.count_cache(len(found), len(keys) - len(found))
+        return found
+
+    def set_raw(self, items):
+        super().set_raw(items)
+        self._remember(items)
+
+    def add_raw(self, key, value, expires):
+        self._forget([key])
+        return super().add_raw(key, value, expires)
+
+    def delete_raw(self, keys):
+        self._forget(keys)
+        return super().delete_raw(keys)
+
+    def incr_raw(self, key, delta):
+        value, pickled, expires = super().incr_raw(key, delta)
+        self._remember({key: (pickled, expires)})
+        return value, pickled, expires
+
+    def clear(self):
+        with self.l1.lock:
+            self.l1.entries.clear()
+        super().clear()
+
+    def hit_ratios(self):
+        """Доля попаданий по уровням во всех процессах хоста."""
+        self.save_stats(self.origin, self.l1.stats)
+        return {
+            tier: hits / (hits + misses) if hits + misses else None
+            for tier, (hits, misses) in self.load_stats().items()
+        }
+
+
+def clear_caches(**kwargs):
+    """После migrate общий кэш мог пережить смену схемы и данных."""
+    for cache in caches.all():
+        cache.clear()
@@ -0,0 +1,53 @@
+import hashlib
+from functools import wraps
+
+from django.utils.cache import patch_cache_control
+from django.utils.translation import get_language
+from django.views.decorators.http import condition
+
+
+def _state(state, request, *args, **kwargs):
+    if getattr(request, 'page_shell', None):
+        return None, None
+    if not hasattr(request, '_conditional_state'):
+        request._conditional_state = state(request, *args, **kwargs)
+    return request._conditional_state
+
+
+def conditional(state):
+    """Условный GET по дешёвому состоянию страницы.
+
+    state(request, *args, **kwargs) возвращает (версию содержимого,
+    время изменения или None) и вызывается один раз на запрос, без
+    загрузки строк страницы. ETag учитывает ещё пользователя и язык;
+    Last-Modified отдаётся только анонимам, ведь страница пользователя
+    меняется и при входе, а время входа в ней не отражено. Оболочку
+    страницы (core.holes) проверяет PageShellMiddleware по заполненному
+    содержимому.
+    """
+    def etag(request, *args, **kwargs):
+        version, _ = _state(state, request, *args, **kwargs)
+        if version is None:
+            return None
+        raw = f'{version}:{request.user.pk}:{get_language()}'
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return None
+        return _state(state, request, *args, **kwargs)[1]
+
+    def decorator(view):
+        conditional_view = condition(etag, last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            # Без Cache-Control браузер может сам счесть копию свежей по
+            # Last-Modified и не спросить сервер.
+            patch_cache_control(response, no_cache=True)
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,68 @@
+"""Рабочий режим SQLite для нескольких потоков и процессов.
+
+PRAGMA из SQLITE_PRAGMAS выполняются на каждом новом подключении:
+WAL не блокирует чтение записью, busy_timeout заставляет ждать чужую
+запись вместо «database is locked». Транзакции процесса к одному файлу
+базы идут через его write_queue по одной в порядке прихода, чтобы
+потоки не спорили за блокировку файла (см. core.sqlite3).
+"""
+import threading
+
+from django.conf import settings
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Обработчик connection_created."""
+    if connection.vendor != 'sqlite':
+        return
+    # Напрямую, мимо обёрток execute: PRAGMA не считаются запросами.
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+class WriteQueue:
+    """Пропускает потоки по одному в порядке прихода."""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.issued = 0
+        self.serving = 0
+        # Билеты потоков, которые не дождались очереди.
+        self.abandoned = set()
+
+    def acquire(self, timeout=None):
+        """Ждёт своей очереди не дольше timeout секунд; False — не
+        дождался и идёт без очереди."""
+        with self.condition:
+            ticket = self.issued
+            self.issued += 1
+            if self.condition.wait_for(
+                lambda: self.serving == ticket, timeout
+            ):
+                return True
+            self.abandoned.add(ticket)
+            return False
+
+    def release(self):
+        with self.condition:
+            self.serving += 1
+            while self.serving in self.abandoned:
+                self.abandoned.remove(self.serving)
+                self.serving += 1
+            self.condition.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def write_queue(name):
+    """Очередь записи для файла базы name."""
+    with _queues_lock:
+        return _queues.setdefault(name, WriteQueue())
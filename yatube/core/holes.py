@@ -0,0 +1,64 @@
+"""Общая для всех пользователей страница с дырами под личные части.
+
+Личные части страницы выводятся тегом {% hole %}. Обычно он сразу
+рисует шаблон дыры, а при отрисовке оболочки (request.page_shell)
+оставляет метку с именем и параметрами. Оболочка сохраняется в кэше
+страниц одна на всех, метки заполняются для каждого пользователя
+функцией fill.
+"""
+import json
+import re
+
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+MARKER = '<!--hole {}-->'
+MARKER_RE = re.compile(r'<!--hole (.*?)-->')
+# Параметры в метке не должны закрыть комментарий раньше времени.
+_ESCAPES = {ord('>'): '\\u003E', ord('<'): '\\u003C', ord('&'): '\\u0026'}
+
+_holes = {}
+
+
+def register(name, template_name):
+    """Регистрирует дыру: функция (request, **params) возвращает
+    контекст её шаблона."""
+    def decorator(get_context):
+        _holes[name] = (template_name, get_context)
+        return get_context
+    return decorator
+
+
+def shared_page(view):
+    """Помечает представление, страница которого одинакова для всех
+    пользователей, кроме дыр."""
+    view.shared_page = True
+    return view
+
+
+def render(request, name, params):
+    template_name, get_context = _holes[name]
+    return render_to_string(
+        template_name, get_context(request, **params), request
+    )
+
+
+def hole(request, name, params):
+    if getattr(request, 'page_shell', None):
+        return mark_safe(
+            MARKER.format(json.dumps([name, params]).translate(_ESCAPES))
+        )
+    return render(request, name, params)
+
+
+def fill(request, content):
+    """Заполняет метки оболочки для пользователя запроса."""
+    return MARKER_RE.sub(
+        lambda match: render(request, *json.loads(match.group(1))),
+        content
+    )
+
+
+@register('user_nav', 'includes/user_nav.html')
+def user_nav(request):
+    return {}
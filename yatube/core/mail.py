@@ -0,0 +1,31 @@
+"""Отправка писем фоновой задачей.
+
+QueuedEmailBackend ставит каждое письмо задачей core.tasks, а задача
+отправляет его бэкендом TASKS_EMAIL_BACKEND. Запрос, отправляющий
+письмо, не ждёт почтовый сервер.
+"""
+import base64
+import pickle
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+from . import tasks
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            # Письмо отправит другое подключение.
+            message.connection = None
+            tasks.enqueue('core.send_email', {
+                'message': base64.b64encode(pickle.dumps(message)).decode()
+            })
+        return len(email_messages)
+
+
+@tasks.task('core.send_email', priority=10)
+def send_email(message):
+    message = pickle.loads(base64.b64decode(message))
+    get_connection(settings.TASKS_EMAIL_BACKEND).send_messages([message])
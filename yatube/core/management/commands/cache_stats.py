@@ -0,0 +1,23 @@
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+
+from core.cache import TwoTierCache
+
+
+class Command(BaseCommand):
+    help = 'Доля попаданий двухуровневого кэша по уровням во всех процессах.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alias', default='default')
+
+    def handle(self, *args, **options):
+        cache = caches[options['alias']]
+        if not isinstance(cache, TwoTierCache):
+            self.stderr.write('Кэш не двухуровневый')
+            return
+        for tier, (hits, misses) in sorted(cache.load_stats().items()):
+            total = hits + misses
+            ratio = f'{hits / total:.1%}' if total else '-'
+            self.stdout.write(
+                f'{tier}: попаданий {hits}, промахов {misses}, доля {ratio}'
+            )
@@ -0,0 +1,57 @@
+import glob
+import os
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import profiling
+
+
+class Command(BaseCommand):
+    help = (
+        'Объединяет стеки профилировщика всех процессов в один файл '
+        'свёрнутого формата для flamegraph.pl, speedscope и подобных.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'views', nargs='*',
+            help='Имена URL, например posts:profile; по умолчанию все.'
+        )
+        parser.add_argument('--directory', default=settings.PROFILER_DIR)
+        parser.add_argument(
+            '--output', help='Файл результата; по умолчанию stdout.'
+        )
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Удалить объединённые файлы процессов.'
+        )
+
+    def handle(self, *args, **options):
+        paths = [
+            path for path in glob.glob(os.path.join(
+                glob.escape(options['directory']), f'*{profiling.SUFFIX}'
+            ))
+            if not options['views']
+            or os.path.basename(path).rsplit('.', 2)[0] in options['views']
+        ]
+        if not paths:
+            raise CommandError('Файлов профилировщика нет.')
+        stacks = Counter()
+        for path in paths:
+            stacks.update(profiling.read(path))
+        lines = ''.join(
+            f'{stack} {count}\n' for stack, count in sorted(stacks.items())
+        )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(lines)
+        else:
+            self.stdout.write(lines, ending='')
+        if options['clear']:
+            for path in paths:
+                os.remove(path)
+        self.stderr.write(
+            f'Файлов: {len(paths)}, снимков: {sum(stacks.values())}'
+        )
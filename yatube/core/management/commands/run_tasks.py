@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import tasks
+
+
+class Command(BaseCommand):
+    help = (
+        'Исполнитель фоновых задач core.tasks. Без --once работает, '
+        'пока не прервать, и раз в --sleep секунд проверяет новые задачи.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'names', nargs='*', help='Только задачи с этими именами.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и выйти.'
+        )
+        parser.add_argument('--sleep', type=float, default=1)
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            batches = tasks.run(names=options['names'])
+            if batches:
+                self.stdout.write(f'Выполнено пачек: {batches}')
+            if options['once']:
+                return
+            if not batches:
+                tasks.purge()
+                time.sleep(options['sleep'])
@@ -0,0 +1,56 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в реплики из DATABASE_REPLICAS '
+        'через backup API — замена репликации для проверки на одной '
+        'машине. С --interval повторяет копирование, пока не прервать.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'replicas', nargs='*',
+            help='Алиасы реплик; по умолчанию все из DATABASE_REPLICAS.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Пауза между копированиями в секундах.'
+        )
+
+    def handle(self, *args, **options):
+        replicas = options['replicas'] or settings.DATABASE_REPLICAS
+        if not replicas:
+            raise CommandError('Реплики не настроены: DATABASE_REPLICAS.')
+        for alias in replicas:
+            if alias not in settings.DATABASE_REPLICAS:
+                raise CommandError(f'{alias} нет в DATABASE_REPLICAS.')
+        while True:
+            started = time.perf_counter()
+            for alias in replicas:
+                self.sync(alias)
+            self.stdout.write(
+                f'Реплики {", ".join(replicas)} обновлены за '
+                f'{time.perf_counter() - started:.2f} с'
+            )
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def sync(self, alias):
+        primary = connections[DEFAULT_DB_ALIAS]
+        primary.ensure_connection()
+        # Копия согласована: backup читает основную базу одним снимком,
+        # а читатели реплики ждут его по busy_timeout.
+        replica = sqlite3.connect(
+            connections.databases[alias]['NAME'], timeout=20
+        )
+        try:
+            primary.connection.backup(replica)
+        finally:
+            replica.close()
@@ -0,0 +1,280 @@
+"""Метрики запросов, общие для всех процессов хоста.
+
+Каждый процесс копит гистограммы и счётчики в памяти и раз в
+METRICS_FLUSH_INTERVAL секунд фоновым потоком записывает свой снимок
+в файл SQLite METRICS_LOCATION (по умолчанию в /dev/shm). Страница
+метрик суммирует снимки всех процессов и отдаёт их в текстовом формате
+Prometheus. Счётчики накопительные, поэтому снимки завершившихся
+процессов не пропадают: при записи своего снимка процесс прибавляет их
+к общей строке MERGED_ORIGIN и удаляет, и число строк не растёт с
+каждым перезапуском.
+"""
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+DURATION_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+# Имя -> (тип, описание, границы корзин гистограммы).
+METRICS = {
+    'yatube_request_duration_seconds': (
+        'histogram', 'Полное время обработки запроса.', DURATION_BUCKETS
+    ),
+    'yatube_sql_duration_seconds': (
+        'histogram', 'Суммарное время SQL за запрос.', DURATION_BUCKETS
+    ),
+    'yatube_sql_queries': (
+        'histogram', 'Число SQL-запросов за запрос.', COUNT_BUCKETS
+    ),
+    'yatube_template_render_seconds': (
+        'histogram', 'Время отрисовки шаблонов за запрос.', DURATION_BUCKETS
+    ),
+    'yatube_cache_hits_total': (
+        'counter', 'Ключи, найденные в кэше.', None
+    ),
+    'yatube_cache_misses_total': (
+        'counter', 'Ключи, не найденные в кэше.', None
+    ),
+    'yatube_thumbnail_seconds': (
+        'histogram', 'Время создания эскизов одной картинки.',
+        DURATION_BUCKETS
+    ),
+}
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS samples ('
+    ' origin TEXT, metric TEXT, labels TEXT, field TEXT,'
+    ' value REAL NOT NULL, PRIMARY KEY (origin, metric, labels, field))'
+)
+
+MERGED_ORIGIN = 'merged'
+
+_lock = threading.Lock()
+_values = defaultdict(float)
+_state = {'pid': None, 'origin': None, 'dirty': False}
+_local = threading.local()
+
+
+def _labels(labels):
+    return ','.join(
+        f'{name}="{value}"' for name, value in sorted(labels.items())
+    )
+
+
+def _started():
+    """Запускает поток записи снимков один раз в каждом процессе."""
+    pid = os.getpid()
+    if _state['pid'] == pid:
+        return
+    _state['pid'] = pid
+    _state['origin'] = f'{pid}:{time.time()}'
+    _values.clear()
+    threading.Thread(target=_flush_forever, daemon=True).start()
+    atexit.register(flush)
+
+
+def observe(metric, value, **labels):
+    """Добавляет наблюдение в гистограмму."""
+    _, _, buckets = METRICS[metric]
+    key = _labels(labels)
+    with _lock:
+        _started()
+        for bound in buckets:
+            if value <= bound:
+                _values[(metric, key, str(bound))] += 1
+        _values[(metric, key, '+Inf')] += 1
+        _values[(metric, key, 'sum')] += value
+        _values[(metric, key, 'count')] += 1
+        _state['dirty'] = True
+
+
+def inc(metric, value=1, **labels):
+    """Увеличивает счётчик."""
+    with _lock:
+        _started()
+        _values[(metric, _labels(labels), 'total')] += value
+        _state['dirty'] = True
+
+
+class RequestMetrics:
+    """Время шаблонов и обращения к кэшу внутри одного запроса."""
+
+    def __init__(self):
+        self.template_time = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Вложенные отрисовки уже входят во время внешней.
+        self.rendering = 0
+
+    def __enter__(self):
+        _local.current = self
+        return self
+
+    def __exit__(self, *exc_info):
+        _local.current = None
+
+
+def current():
+    """Метрики текущего запроса потока или None вне запроса."""
+    return getattr(_local, 'current', None)
+
+
+def count_cache(hits, misses):
+    request = current()
+    if request is not None:
+        request.cache_hits += hits
+        request.cache_misses += misses
+
+
+def _connect():
+    connection = sqlite3.connect(
+        settings.METRICS_LOCATION, timeout=10, isolation_level=None
+    )
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute(SCHEMA)
+    return connection
+
+
+def _alive(origin):
+    """Жив ли процесс снимка; снимки не из «pid:время» не трогаются."""
+    try:
+        pid = int(origin.split(':')[0])
+    except ValueError:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Процесс есть, но принадлежит другому пользователю.
+        pass
+    return True
+
+
+def _merge_dead(connection):
+    """Прибавляет снимки завершившихся процессов к MERGED_ORIGIN."""
+    dead = [
+        origin for origin, in connection.execute(
+            'SELECT DISTINCT origin FROM samples WHERE origin != ?',
+            (MERGED_ORIGIN,)
+        )
+        if not _alive(origin)
+    ]
+    if not dead:
+        return
+    marks = ', '.join('?' * len(dead))
+    connection.execute(
+        'INSERT INTO samples '
+        'SELECT ?, metric, labels, field, SUM(value) FROM samples '
+        f'WHERE origin IN ({marks}) GROUP BY metric, labels, field '
+        'ON CONFLICT (origin, metric, labels, field) '
+        'DO UPDATE SET value = value + excluded.value',
+        (MERGED_ORIGIN, *dead)
+    )
+    connection.execute(
+        f'DELETE FROM samples WHERE origin IN ({marks})', dead
+    )
+
+
+def flush():
+    """Записывает снимок метрик процесса."""
+    with _lock:
+        if not _state['dirty']:
+            return
+        rows = [
+            (_state['origin'], metric, labels, field, value)
+            for (metric, labels, field), value in _values.items()
+        ]
+        _state['dirty'] = False
+    connection = _connect()
+    try:
+        connection.execute('BEGIN IMMEDIATE')
+        connection.executemany(
+            'INSERT OR REPLACE INTO samples VALUES (?, ?, ?, ?, ?)', rows
+        )
+        _merge_dead(connection)
+        connection.execute('COMMIT')
+    finally:
+        connection.close()
+
+
+def _flush_forever():
+    pid = os.getpid()
+    while _state['pid'] == pid:
+        time.sleep(settings.METRICS_FLUSH_INTERVAL)
+        flush()
+
+
+def collect():
+    """Суммы по всем процессам: (метрика, метки, поле) -> значение."""
+    flush()
+    connection = _connect()
+    try:
+        rows = connection.execute(
+            'SELECT metric, labels, field, SUM(value) FROM samples '
+            'GROUP BY metric, labels, field'
+        ).fetchall()
+    finally:
+        connection.close()
+    return {(metric, labels, field): value
+            for metric, labels, field, value in rows}
+
+
+def _number(value):
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+def _sample(name, labels, value):
+    if labels:
+        return f'{name}{{{labels}}} {_number(value)}'
+    return f'{name} {_number(value)}'
+
+
+def render():
+    """Метрики в текстовом формате Prometheus."""
+    values = collect()
+    series = defaultdict(set)
+    for metric, labels, _ in values:
+        series[metric].add(labels)
+    lines = []
+    for metric, (kind, description, buckets) in METRICS.items():
+        lines.append(f'# HELP {metric} {description}')
+        lines.append(f'# TYPE {metric} {kind}')
+        for labels in sorted(series[metric]):
+            if kind == 'counter':
+                lines.append(_sample(
+                    metric, labels, values[(metric, labels, 'total')]
+                ))
+                continue
+            for bound in (*map(str, buckets), '+Inf'):
+                bucket = ','.join(filter(None, (labels, f'le="{bound}"')))
+                lines.append(_sample(
+                    f'{metric}_bucket', bucket,
+                    values.get((metric, labels, bound), 0)
+                ))
+            for field in ('sum', 'count'):
+                lines.append(_sample(
+                    f'{metric}_{field}', labels,
+                    values[(metric, labels, field)]
+                ))
+    return '\n'.join(lines) + '\n'
+
+
+def clear(**kwargs):
+    """Сбрасывает метрики всех процессов."""
+    with _lock:
+        _values.clear()
+        _state['dirty'] = False
+    connection = _connect()
+    try:
+        connection.execute('DELETE FROM samples')
+    finally:
+        connection.close()
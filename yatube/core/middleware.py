@@ -0,0 +1,279 @@
+import hashlib
+import logging
+import random
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.functional import SimpleLazyObject, cached_property
+from django.utils.http import parse_http_date_safe, quote_etag
+
+from . import auth, holes, metrics, page_cache, profiling, routers
+from .queries import QueryBudgetExceeded, QueryRecorder, violations
+
+logger = logging.getLogger('core.queries')
+
+
+class MetricsMiddleware:
+    """Записывает в core.metrics время запроса, SQL и шаблонов, число
+    SQL-запросов и обращения к кэшу с меткой view — именем URL.
+
+    Ставится первой, чтобы время включало остальные middleware и страницы
+    из кэша гостей.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with QueryRecorder() as recorder, \
+                metrics.RequestMetrics() as current:
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+        view = self.view_name(request)
+        metrics.observe('yatube_request_duration_seconds', elapsed, view=view)
+        metrics.observe(
+            'yatube_sql_duration_seconds', recorder.duration, view=view
+        )
+        metrics.observe('yatube_sql_queries', recorder.count, view=view)
+        metrics.observe(
+            'yatube_template_render_seconds', current.template_time,
+            view=view
+        )
+        metrics.inc('yatube_cache_hits_total', current.cache_hits, view=view)
+        metrics.inc(
+            'yatube_cache_misses_total', current.cache_misses, view=view
+        )
+        return response
+
+    def view_name(self, request):
+        # Страницы из кэша гостей отдаются до разбора адреса.
+        match = request.resolver_match
+        if match is None:
+            try:
+                match = resolve(request.path_info)
+            except Resolver404:
+                return '<unresolved>'
+        return match.view_name
+
+
+class ProfilerMiddleware:
+    """Профилирует выборку запросов через core.profiling.
+
+    Профилируется доля PROFILER_SAMPLE_RATE запросов к URL из
+    PROFILER_URL_NAMES, а также запросы персонала сайта с заголовком
+    PROFILER_HEADER и запросы с адресов из PROFILER_ALLOWED_IPS, где
+    заголовок равен PROFILER_TOKEN.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            profile = getattr(request, 'profile', None)
+            if profile is not None:
+                profile.stop()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        name = request.resolver_match.view_name
+        requested = (
+            settings.PROFILER_HEADER in request.META
+            and auth.is_trusted(
+                request, request.META[settings.PROFILER_HEADER],
+                settings.PROFILER_TOKEN, settings.PROFILER_ALLOWED_IPS
+            )
+        )
+        sampled = (
+            name in settings.PROFILER_URL_NAMES
+            and random.random() < settings.PROFILER_SAMPLE_RATE
+        )
+        if requested or sampled:
+            request.profile = profiling.Profile(name)
+            request.profile.start()
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """AuthenticationMiddleware, которая берёт пользователя из кэша
+    core.auth."""
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: auth.get_user(request))
+
+
+class ReplicaMiddleware:
+    """Ведёт состояние запроса для core.routers.ReplicaRouter.
+
+    Ставится после AuthenticationMiddleware и перед PageShellMiddleware,
+    чтобы дыры оболочки тоже читали с реплики.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with routers.RequestState(request):
+            return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not (settings.DATABASE_REPLICAS
+                and getattr(view_func, 'replica_reads', False)
+                and not routers.sticky(request.user)):
+            return
+        routers.state().replica = True
+        # Насколько данные страницы могут отставать: по этому значению
+        # кэши не хранят её дольше, чем реплика догоняет сброс.
+        request.replica_lag = settings.REPLICA_STICKY_SECONDS
+
+
+class QueryBudgetMiddleware:
+    """Проверяет число и время SQL-запросов на запрос по бюджетам URL.
+
+    Бюджеты объявляются рядом с urls.py приложения в словаре
+    query_budgets: имя URL -> (число запросов, мс в SQL). В режиме
+    QUERY_BUDGET_RAISE нарушение поднимает исключение, иначе пишется в лог
+    и учитывается в core.queries.violations.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    @cached_property
+    def budgets(self):
+        budgets = {}
+        for path in settings.QUERY_BUDGET_MODULES:
+            module = import_module(path)
+            for name, budget in module.query_budgets.items():
+                budgets[f'{module.app_name}:{name}'] = budget
+        return budgets
+
+    def __call__(self, request):
+        with QueryRecorder(settings.QUERY_BUDGET_IGNORE) as recorder:
+            response = self.get_response(request)
+        match = request.resolver_match
+        if match is None:
+            return response
+        max_queries, max_ms = self.budgets.get(match.view_name, (None, None))
+        problems = recorder.problems(
+            max_queries, max_ms, settings.QUERY_BUDGET_REPEAT_LIMIT
+        )
+        for kind, message in problems:
+            violations[(match.view_name, kind)] += 1
+            logger.warning('%s %s: %s', request.path, kind, message)
+        if problems and settings.QUERY_BUDGET_RAISE:
+            raise QueryBudgetExceeded(
+                f'{match.view_name}: '
+                + '; '.join(message for _, message in problems)
+            )
+        return response
+
+
+class AnonymousPageCacheMiddleware:
+    """Отдаёт гостям целые страницы из кэша раньше сессий, CSRF и шаблонов.
+
+    Гость — запрос без cookie сессии и сообщений. Сохраняются успешные
+    GET-ответы без cookies, помеченные core.page_cache.tag, на
+    PAGE_CACHE_TIMEOUT секунд. Ставится перед SessionMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.is_cacheable(request):
+            return self.get_response(request)
+        response = page_cache.get(request)
+        if response is not None:
+            return self.conditional(request, response)
+        started = time.time()
+        response = self.get_response(request)
+        if (request.method == 'GET' and response.status_code == 200
+                and not response.streaming and not response.cookies
+                and response.has_header(page_cache.HEADER)):
+            page_cache.store(
+                request, response, started, settings.PAGE_CACHE_TIMEOUT
+            )
+        return response
+
+    def is_cacheable(self, request):
+        return (
+            settings.PAGE_CACHE_TIMEOUT
+            and request.method in ('GET', 'HEAD')
+            and settings.SESSION_COOKIE_NAME not in request.COOKIES
+            and CookieStorage.cookie_name not in request.COOKIES
+        )
+
+    def conditional(self, request, response):
+        last_modified = response.has_header('Last-Modified') and (
+            parse_http_date_safe(response['Last-Modified'])
+        )
+        return get_conditional_response(
+            request,
+            etag=response.get('ETag'),
+            last_modified=last_modified,
+            response=response,
+        )
+
+
+class PageShellMiddleware:
+    """Отдаёт пользователям общую оболочку страницы с заполненными дырами.
+
+    Для представлений, помеченных core.holes.shared_page, страница
+    рисуется с метками вместо личных частей, сохраняется в кэше страниц
+    одна на всех и для каждого пользователя только заполняется. ETag
+    считается по заполненной странице. Ставится после
+    AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        started = getattr(request, 'page_shell', None)
+        if started is None or response.streaming:
+            return response
+        if (response.status_code == 200 and not response.cookies
+                and response.has_header(page_cache.HEADER)):
+            page_cache.store(
+                request, response, started, settings.PAGE_CACHE_TIMEOUT,
+                kind=page_cache.SHELL
+            )
+        return self.fill(request, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not (
+            settings.PAGE_CACHE_TIMEOUT
+            and request.method in ('GET', 'HEAD')
+            and getattr(view_func, 'shared_page', False)
+            and request.user.is_authenticated
+        ):
+            return None
+        shell = page_cache.get(request, kind=page_cache.SHELL)
+        if shell is not None:
+            return self.fill(request, shell)
+        request.page_shell = time.time()
+        return None
+
+    def fill(self, request, response):
+        if response.status_code != 200:
+            return response
+        content = holes.fill(
+            request, response.content.decode(response.charset)
+        )
+        response.content = content
+        response['ETag'] = quote_etag(
+            hashlib.md5(response.content).hexdigest()
+        )
+        patch_cache_control(response, no_cache=True, private=True)
+        return get_conditional_response(
+            request, etag=response['ETag'], response=response
+        )
@@ -0,0 +1,100 @@
+"""Кэш целых страниц для гостей с очисткой по суррогатным ключам.
+
+Представление помечает ответ ключами (tag), от которых зависит страница:
+пост, автор, группа, общая лента. purge запоминает время сброса ключа;
+страница, сохранённая раньше сброса любого своего ключа, считается
+устаревшей. Время сброса читается одним get_many, поэтому очистка не
+перебирает сохранённые страницы. Ключ ALL есть у каждой страницы:
+purge(ALL) сбрасывает их все, не трогая остальное содержимое кэша.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.utils.translation import get_language
+
+HEADER = 'Surrogate-Key'
+PAGE_KEY = 'page:{}:{}'
+PAGE = 'page'
+SHELL = 'shell'
+PURGED_KEY = 'page:purged:{}'
+ALL = 'all'
+
+
+def tag(response, *keys):
+    """Добавляет ответу суррогатные ключи, по которым его сбрасывает
+    purge."""
+    keys = [*response.get(HEADER, '').split(), *map(str, keys)]
+    response[HEADER] = ' '.join(dict.fromkeys(keys))
+    return response
+
+
+def _purge(keys):
+    now = time.time()
+    cache.set_many({PURGED_KEY.format(key): now for key in keys}, None)
+
+
+def purge(*keys):
+    """Сбрасывает страницы, помеченные любым из ключей."""
+    _purge(keys)
+    if connection.in_atomic_block:
+        # Страницу могли отрисовать по данным до фиксации транзакции.
+        transaction.on_commit(lambda: _purge(keys))
+
+
+def _page_key(request, kind):
+    url = f'{get_language()}:{request.build_absolute_uri()}'
+    return PAGE_KEY.format(kind, hashlib.md5(url.encode()).hexdigest())
+
+
+def _purged(keys):
+    """Время сброса ключей или None, если какое-то из них неизвестно."""
+    purged = cache.get_many([PURGED_KEY.format(key) for key in keys])
+    if len(purged) < len(keys):
+        return None
+    return max(purged.values(), default=0)
+
+
+def get(request, kind=PAGE):
+    """Сохранённый ответ на запрос, если ни один его ключ не сброшен.
+
+    kind отделяет готовые страницы гостей (PAGE) от оболочек с дырами
+    для пользователей (SHELL).
+    """
+    entry = cache.get(_page_key(request, kind))
+    if entry is None:
+        return None
+    saved, keys, status, headers, content = entry
+    purged = _purged(keys)
+    if purged is None or purged >= saved:
+        return None
+    response = HttpResponse(content, status=status)
+    for name, value in headers:
+        response[name] = value
+    return response
+
+
+def store(request, response, started, timeout, kind=PAGE):
+    """Сохраняет ответ, отрисованный начиная с момента started."""
+    keys = [ALL, *response[HEADER].split()]
+    # Страница с реплики могла не увидеть недавний сброс.
+    started -= getattr(request, 'replica_lag', 0)
+    purged = _purged(keys)
+    if purged is None:
+        # Неизвестное время сброса (ключ новый или вытеснен) не с чем
+        # сравнить: считаем, что ключ сброшен сейчас, и сохраним
+        # страницу при следующем запросе.
+        now = time.time()
+        for key in keys:
+            cache.add(PURGED_KEY.format(key), now, None)
+        return
+    if purged >= started:
+        return
+    cache.set(
+        _page_key(request, kind),
+        (started, keys, response.status_code, list(response.items()),
+         response.content),
+        timeout
+    )
@@ -0,0 +1,126 @@
+"""Статистический профилировщик запросов.
+
+Один фоновый поток в процессе раз в PROFILER_INTERVAL секунд снимает
+стеки потоков, которые сейчас обрабатывают профилируемые запросы, и
+считает одинаковые стеки. Пока таких запросов нет, поток спит. После
+запроса стеки дописываются в PROFILER_DIR/<имя URL>.<pid>.folded в
+свёрнутом формате flamegraph: «кадр;кадр;кадр число». Файлы разных
+процессов объединяет manage.py merge_profiles.
+"""
+import os
+import site
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+SUFFIX = '.folded'
+
+_lock = threading.Lock()
+_active = {}
+_wakeup = threading.Event()
+_state = {'pid': None}
+_labels = {}
+_prefixes = sorted(
+    {
+        os.path.join(path, '')
+        for path in (*sys.path, *site.getsitepackages(), settings.BASE_DIR)
+        if path
+    },
+    key=len, reverse=True
+)
+
+
+def _label(code):
+    """Кадр стека: путь модуля без каталога sys.path и функция."""
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        for prefix in _prefixes:
+            if filename.startswith(prefix):
+                filename = filename[len(prefix):]
+                break
+        label = f'{filename}:{code.co_name}'.replace(';', ':')
+        _labels[code] = label
+    return label
+
+
+def collapse(frame, root):
+    frames = []
+    while frame is not None:
+        frames.append(_label(frame.f_code))
+        frame = frame.f_back
+    frames.append(root)
+    return ';'.join(reversed(frames))
+
+
+def _started():
+    """Запускает поток снятия стеков один раз в каждом процессе."""
+    pid = os.getpid()
+    if _state['pid'] == pid:
+        return
+    _state['pid'] = pid
+    threading.Thread(target=_sample_forever, args=(pid,), daemon=True).start()
+
+
+def _sample_forever(pid):
+    while _state['pid'] == pid:
+        with _lock:
+            idle = not _active
+            if idle:
+                _wakeup.clear()
+        if idle:
+            _wakeup.wait()
+            continue
+        time.sleep(settings.PROFILER_INTERVAL)
+        frames = sys._current_frames()
+        with _lock:
+            for thread_id, profile in _active.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    profile.stacks[collapse(frame, profile.name)] += 1
+
+
+class Profile:
+    """Стеки потока одного запроса между start и stop."""
+
+    def __init__(self, name):
+        self.name = name
+        self.stacks = Counter()
+        self.thread_id = None
+
+    def start(self):
+        self.thread_id = threading.get_ident()
+        with _lock:
+            _started()
+            _active[self.thread_id] = self
+            _wakeup.set()
+
+    def stop(self):
+        with _lock:
+            _active.pop(self.thread_id, None)
+        self.save()
+
+    def save(self):
+        if not self.stacks:
+            return
+        os.makedirs(settings.PROFILER_DIR, exist_ok=True)
+        filename = f'{self.name.replace(os.sep, "_")}.{os.getpid()}{SUFFIX}'
+        path = os.path.join(settings.PROFILER_DIR, filename)
+        with open(path, 'a', encoding='utf-8') as file:
+            file.writelines(
+                f'{stack} {count}\n' for stack, count in self.stacks.items()
+            )
+
+
+def read(path):
+    """Стеки свёрнутого файла: стек -> число снимков."""
+    stacks = Counter()
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            if stack:
+                stacks[stack] += int(count)
+    return stacks
@@ -0,0 +1,90 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+violations = Counter()
+
+TRANSACTION_CONTROL = re.compile(
+    r'^\s*(?:(?:RELEASE |ROLLBACK TO )?SAVEPOINT|BEGIN|COMMIT|ROLLBACK)\b',
+    re.IGNORECASE
+)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def fingerprint(sql):
+    """Нормализует SQL: литералы и списки IN заменяются на `?`."""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'%s|\b\d+(?:\.\d+)?\b', '?', sql)
+    sql = re.sub(r'\(\s*\?(?:\s*,\s*\?)*\s*\)', '(?)', sql)
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+class QueryRecorder:
+    """Записывает выполненные запросы и их время во всех подключениях.
+
+    Управление транзакциями и запросы, совпадающие с шаблонами ignore,
+    не учитываются.
+    """
+
+    def __init__(self, ignore=()):
+        self.queries = []
+        self.ignore = [TRANSACTION_CONTROL]
+        self.ignore += [re.compile(pattern) for pattern in ignore]
+        self._stack = ExitStack()
+
+    def __call__(self, execute, sql, params, many, context):
+        if any(pattern.search(sql) for pattern in self.ignore):
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    def __enter__(self):
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(duration for _, duration in self.queries)
+
+    def repeated(self, limit):
+        """Повторяющиеся запросы — признак N+1."""
+        fingerprints = Counter(fingerprint(sql) for sql, _ in self.queries)
+        return {
+            sql: count for sql, count in fingerprints.items() if count > limit
+        }
+
+    def problems(self, max_queries=None, max_ms=None, repeat_limit=None):
+        found = []
+        if max_queries is not None and self.count > max_queries:
+            found.append(
+                ('queries', f'{self.count} запросов при бюджете {max_queries}')
+            )
+        if max_ms is not None and self.duration * 1000 > max_ms:
+            found.append((
+                'time',
+                f'{self.duration * 1000:.1f} мс в SQL при бюджете {max_ms} мс'
+            ))
+        if repeat_limit is not None:
+            for sql, count in self.repeated(repeat_limit).items():
+                found.append(('n+1', f'{count} раз: {sql}'))
+        return found
@@ -0,0 +1,86 @@
+"""Чтение с реплик базы с «липкостью» к основной после своих записей.
+
+Представления, помеченные replica_reads, читают со случайной реплики
+из DATABASE_REPLICAS; всё остальное и любые записи идут в основную базу.
+Пользователь, который только что записал, REPLICA_STICKY_SECONDS секунд
+читает из основной базы, чтобы сразу видеть свой пост или комментарий,
+пока реплики его не догнали. Состояние запроса ведёт ReplicaMiddleware.
+"""
+import random
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_KEY = 'replica:sticky:{}'
+
+_local = threading.local()
+
+
+def replica_reads(view):
+    """Помечает представление, которое только читает и может читать
+    с реплики."""
+    view.replica_reads = True
+    return view
+
+
+class RequestState:
+    def __init__(self, request):
+        self.request = request
+        self.replica = False
+        self.wrote = False
+
+    def __enter__(self):
+        _local.state = self
+        return self
+
+    def __exit__(self, *exc_info):
+        _local.state = None
+        if not (settings.DATABASE_REPLICAS and self.wrote):
+            return
+        # После входа в запросе уже новый пользователь.
+        user_id = self.request.user.pk
+        if user_id is not None:
+            cache.set(
+                STICKY_KEY.format(user_id), True,
+                settings.REPLICA_STICKY_SECONDS
+            )
+
+
+def state():
+    return getattr(_local, 'state', None)
+
+
+def sticky(user):
+    """Пользователь недавно писал и читает из основной базы."""
+    return (
+        user.pk is not None
+        and cache.get(STICKY_KEY.format(user.pk)) is not None
+    )
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        current = state()
+        if (settings.DATABASE_REPLICAS and current is not None
+                and current.replica):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Объект, прочитанный с реплики, сохраняется в основную базу.
+        current = state()
+        if current is not None:
+            current.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Схема приходит на реплики вместе с копией базы.
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,85 @@
+"""Сессии в кэше с отложенной записью в базу.
+
+Сессия читается и пишется в кэш SESSION_CACHE_ALIAS; база нужна, только
+если в кэше сессии нет. Изменённые сессии процесс копит и записывает в
+базу одной пачкой после запроса, не чаще раза в SESSION_WRITE_BEHIND
+секунд. В базу идут данные из кэша на момент записи: сессию, удалённую
+при выходе в другом процессе, пачка не воскресит. Сессии, изменённые
+за последние SESSION_WRITE_BEHIND секунд, в базе ещё старые — очистка
+кэша в это время возвращает их к прошлому состоянию.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+from django.contrib.sessions.backends.base import CreateError
+from django.contrib.sessions.models import Session
+from django.db import transaction
+
+# Ключ сессии -> срок её действия, ещё не записанные в базу.
+_pending = {}
+_lock = threading.Lock()
+_flushed = time.monotonic()
+
+
+class SessionStore(cached_db.SessionStore):
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        if must_create:
+            if not self._cache.add(
+                self.cache_key, data, self.get_expiry_age()
+            ):
+                raise CreateError
+        else:
+            self._cache.set(self.cache_key, data, self.get_expiry_age())
+        with _lock:
+            _pending[self.session_key] = self.get_expiry_date()
+
+    def delete(self, session_key=None):
+        with _lock:
+            _pending.pop(session_key or self.session_key, None)
+        super().delete(session_key)
+
+
+def flush(batch_size=300):
+    """Записывает накопленные сессии в базу; возвращает их число."""
+    global _flushed
+    with _lock:
+        pending = list(_pending.items())
+        _pending.clear()
+        _flushed = time.monotonic()
+    written = 0
+    for start in range(0, len(pending), batch_size):
+        written += _write(pending[start:start + batch_size])
+    return written
+
+
+def _write(pending):
+    store = SessionStore()
+    prefix = store.cache_key_prefix
+    found = store._cache.get_many([prefix + key for key, _ in pending])
+    sessions = [
+        Session(
+            session_key=key,
+            session_data=store.encode(found[prefix + key]),
+            expire_date=expire_date,
+        )
+        for key, expire_date in pending if prefix + key in found
+    ]
+    if not sessions:
+        return 0
+    with transaction.atomic():
+        Session.objects.filter(
+            pk__in=[session.pk for session in sessions]
+        ).delete()
+        Session.objects.bulk_create(sessions)
+    return len(sessions)
+
+
+def flush_due(sender, **kwargs):
+    """Обработчик request_finished."""
+    if time.monotonic() - _flushed >= settings.SESSION_WRITE_BEHIND:
+        flush()
@@ -0,0 +1,84 @@
+"""Пересчёт закэшированных значений без лавины одинаковых запросов.
+
+Значение хранится вместе со временем пересчёта и мягким сроком.
+Незадолго до срока ключ с вероятностью, растущей по мере приближения
+к нему (XFetch), пересчитывается заранее. Пересчитывает один запрос,
+взявший блокировку, остальные получают прежнее значение, а если его
+нет — ждут результата.
+"""
+import math
+import random
+import time
+
+from django.core.cache import cache as default_cache
+
+LOCK_KEY = '{}:lock'
+STALE_TIMEOUT = 60
+LOCK_TIMEOUT = 30
+WAIT_TIMEOUT = 5
+WAIT_STEP = 0.05
+
+
+def _entry(value):
+    # Значения, записанные в кэш не через get_or_compute, не подходят.
+    return value if isinstance(value, tuple) and len(value) == 3 else None
+
+
+def _fresh(entry, beta):
+    _, duration, expires = entry
+    if expires is None:
+        return True
+    early = -duration * beta * math.log(1 - random.random())
+    return time.time() + early < expires
+
+
+def _recompute(cache, key, compute, timeout, stale):
+    started = time.time()
+    value = compute()
+    finished = time.time()
+    if timeout is None:
+        cache.set(key, (value, finished - started, None), None)
+    else:
+        cache.set(
+            key,
+            (value, finished - started, finished + timeout),
+            timeout + stale
+        )
+    return value
+
+
+def get_or_compute(key, compute, timeout, cache=None, stale=STALE_TIMEOUT,
+                   beta=1.0, wait=WAIT_TIMEOUT):
+    """Значение ключа из кэша; compute() вызывается не более чем одним
+    запросом одновременно.
+
+    После мягкого срока timeout значение ещё stale секунд отдаётся тем,
+    кто не взял блокировку. Без значения запросы ждут до wait секунд,
+    затем считают сами.
+    """
+    cache = cache or default_cache
+    entry = _entry(cache.get(key))
+    if entry is not None and _fresh(entry, beta):
+        return entry[0]
+    lock = LOCK_KEY.format(key)
+    deadline = time.monotonic() + wait
+    while True:
+        if cache.add(lock, True, LOCK_TIMEOUT):
+            try:
+                # Пока ждали блокировку, значение мог обновить другой.
+                current = _entry(cache.get(key))
+                if current is not None and (
+                    entry is None or current[2] != entry[2]
+                ):
+                    return current[0]
+                return _recompute(cache, key, compute, timeout, stale)
+            finally:
+                cache.delete(lock)
+        if entry is not None:
+            return entry[0]
+        if time.monotonic() >= deadline:
+            return compute()
+        time.sleep(WAIT_STEP)
+        entry = _entry(cache.get(key))
+        if entry is not None:
+            return entry[0]
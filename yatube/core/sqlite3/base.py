@@ -0,0 +1,55 @@
+"""Бэкенд SQLite, который начинает транзакции с BEGIN IMMEDIATE.
+
+Транзакция по умолчанию (DEFERRED) сначала читает, а блокировку записи
+просит только на первом INSERT или UPDATE. В режиме WAL такая
+транзакция получает «database is locked» сразу, без busy_timeout, если
+другое подключение успело записать после её чтения. IMMEDIATE берёт
+блокировку записи в начале и ждёт её по busy_timeout.
+
+С SQLITE_SERIALIZE_WRITES транзакции процесса к одному файлу ещё и
+стоят в core.db.write_queue: от BEGIN до COMMIT или ROLLBACK, не
+дольше SQLITE_WRITE_QUEUE_TIMEOUT секунд ожидания. Кто не дождался,
+пишет без очереди и ждёт блокировку файла по busy_timeout.
+"""
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+from core import db
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # Очередь, в которой подключение стоит на время транзакции.
+    _queue = None
+
+    def _start_transaction_under_autocommit(self):
+        if settings.SQLITE_SERIALIZE_WRITES:
+            queue = db.write_queue(self.settings_dict['NAME'])
+            if queue.acquire(settings.SQLITE_WRITE_QUEUE_TIMEOUT):
+                self._queue = queue
+        try:
+            if settings.SQLITE_IMMEDIATE_TRANSACTIONS:
+                self.cursor().execute('BEGIN IMMEDIATE')
+            else:
+                super()._start_transaction_under_autocommit()
+        except Exception:
+            self._leave_queue()
+            raise
+
+    def _set_autocommit(self, autocommit):
+        # Возврат в autocommit — конец транзакции atomic.
+        try:
+            super()._set_autocommit(autocommit)
+        finally:
+            if autocommit:
+                self._leave_queue()
+
+    def _close(self):
+        try:
+            super()._close()
+        finally:
+            self._leave_queue()
+
+    def _leave_queue(self):
+        queue, self._queue = self._queue, None
+        if queue is not None:
+            queue.release()
@@ -0,0 +1,181 @@
+"""Фоновые задачи в таблице базы.
+
+Задача ставится в той же транзакции, что и запись, ради которой она
+нужна: откат записи отменяет и задачу. manage.py run_tasks выбирает
+готовые задачи по приоритету, пачками до batch_size задач одного
+имени, и при ошибке откладывает их с растущей паузой до max_attempts
+попыток; пачка, упавшая с PartialFailure, откладывает только
+невыполненные задачи. Задача с ключом key ставится один раз: повтор
+с тем же ключом ничего не делает. С TASKS_EAGER задачи выполняются
+сразу после фиксации транзакции в том же процессе.
+"""
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+
+
+class PartialFailure(Exception):
+    """Пачка выполнена не целиком: failed — параметры невыполненных
+    задач, error — последняя ошибка."""
+
+    def __init__(self, failed, error):
+        super().__init__(f'{type(error).__name__}: {error}')
+        self.failed = failed
+        self.error = error
+
+
+def task(name, batch_size=1, max_attempts=5, priority=0):
+    """Регистрирует функцию задачи.
+
+    Функция с batch_size 1 получает параметры задачи именованными
+    аргументами, с большим — список словарей параметров пачки.
+    """
+    def decorator(func):
+        _tasks[name] = (func, batch_size, max_attempts, priority)
+        return func
+    return decorator
+
+
+def enqueue(name, params=None, key=None, priority=None, delay=0):
+    """Ставит задачу одним INSERT."""
+    _, _, max_attempts, default_priority = _tasks[name]
+    Task.objects.bulk_create([Task(
+        name=name,
+        payload=json.dumps(params or {}),
+        priority=default_priority if priority is None else priority,
+        max_attempts=max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        key=key,
+    )], ignore_conflicts=key is not None)
+    if settings.TASKS_EAGER and not delay:
+        transaction.on_commit(lambda: run(names=[name]))
+
+
+def _backoff(attempts):
+    return min(
+        settings.TASKS_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.TASKS_RETRY_MAX_DELAY
+    )
+
+
+def claim(names=None, ids=None):
+    """Забирает пачку готовых задач одного имени."""
+    now = timezone.now()
+    lock = now + timedelta(seconds=settings.TASKS_LOCK_TIMEOUT)
+    with transaction.atomic():
+        # Задачи упавших исполнителей снова становятся готовыми, если
+        # у них остались попытки.
+        stale = Task.objects.filter(status=Task.RUNNING, locked_until__lt=now)
+        stale.filter(attempts__gte=F('max_attempts')).update(
+            status=Task.FAILED, finished=now, locked_until=None,
+            error='Исполнитель не завершил задачу'
+        )
+        stale.update(status=Task.PENDING, locked_until=None)
+        due = Task.objects.filter(
+            status=Task.PENDING, run_at__lte=now
+        ).select_for_update(skip_locked=True)
+        if names:
+            due = due.filter(name__in=names)
+        if ids is not None:
+            due = due.filter(pk__in=ids)
+        first = due.order_by('-priority', 'run_at', 'pk').first()
+        if first is None:
+            return []
+        _, batch_size, _, _ = _tasks[first.name]
+        batch = list(due.filter(name=first.name).order_by(
+            '-priority', 'run_at', 'pk'
+        )[:batch_size])
+        Task.objects.filter(pk__in=[queued.pk for queued in batch]).update(
+            status=Task.RUNNING, locked_until=lock,
+            attempts=F('attempts') + 1
+        )
+    for queued in batch:
+        queued.attempts += 1
+    return batch
+
+
+def execute(batch):
+    """Выполняет пачку и отмечает результат; True, если без ошибок."""
+    name = batch[0].name
+    func, batch_size, _, _ = _tasks[name]
+    params = [json.loads(queued.payload) for queued in batch]
+    try:
+        if batch_size == 1:
+            func(**params[0])
+        else:
+            func(params)
+    except PartialFailure as partial:
+        logger.warning('Пачка задач %s выполнена не целиком: %s',
+                       name, partial)
+        failed = {id(item) for item in partial.failed}
+        _failed([
+            queued for queued, item in zip(batch, params)
+            if id(item) in failed
+        ], partial.error)
+        _done([
+            queued for queued, item in zip(batch, params)
+            if id(item) not in failed
+        ])
+        return False
+    except Exception as error:
+        logger.exception('Задача %s не выполнена', name)
+        _failed(batch, error)
+        return False
+    _done(batch)
+    return True
+
+
+def _done(batch):
+    Task.objects.filter(pk__in=[queued.pk for queued in batch]).update(
+        status=Task.DONE, finished=timezone.now(), error='',
+        locked_until=None
+    )
+
+
+def _failed(batch, error):
+    now = timezone.now()
+    for queued in batch:
+        if queued.attempts >= queued.max_attempts:
+            changes = {'status': Task.FAILED, 'finished': now}
+        else:
+            changes = {
+                'status': Task.PENDING,
+                'run_at': now + timedelta(seconds=_backoff(queued.attempts)),
+            }
+        Task.objects.filter(pk=queued.pk).update(
+            error=f'{type(error).__name__}: {error}', locked_until=None,
+            **changes
+        )
+
+
+def run(ids=None, names=None):
+    """Выполняет готовые задачи, пока они есть; возвращает число пачек."""
+    batches = 0
+    while True:
+        batch = claim(names=names, ids=ids)
+        if not batch:
+            return batches
+        execute(batch)
+        batches += 1
+
+
+def purge():
+    """Удаляет выполненные задачи старше TASKS_RETENTION секунд; ключи
+    таких задач снова можно ставить."""
+    return Task.objects.filter(
+        status=Task.DONE,
+        finished__lt=timezone.now() - timedelta(
+            seconds=settings.TASKS_RETENTION
+        )
+    ).delete()[0]
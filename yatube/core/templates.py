@@ -0,0 +1,32 @@
+"""Шаблоны Django с замером времени отрисовки для core.metrics."""
+import time
+
+from django.template import TemplateDoesNotExist
+from django.template.backends import django
+
+from . import metrics
+
+
+class Template(django.Template):
+    def render(self, context=None, request=None):
+        current = metrics.current()
+        if current is None or current.rendering:
+            return super().render(context, request)
+        current.rendering += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            current.template_time += time.perf_counter() - started
+            current.rendering -= 1
+
+
+class DjangoTemplates(django.DjangoTemplates):
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django.reraise(exc, self)
@@ -0,0 +1,11 @@
+from django import template
+
+from .. import holes
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, **params):
+    """Личная часть страницы, см. core.holes."""
+    return holes.hole(context['request'], name, params)
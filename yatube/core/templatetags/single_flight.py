@@ -0,0 +1,50 @@
+from django import template
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.templatetags.cache import CacheNode
+from django.templatetags.cache import do_cache as django_do_cache
+
+from ..single_flight import get_or_compute
+
+register = template.Library()
+
+
+class SingleFlightCacheNode(CacheNode):
+    """{% cache %}, который пересчитывает фрагмент через get_or_compute."""
+
+    def fragment_cache(self, context):
+        if self.cache_name:
+            return caches[self.cache_name.resolve(context)]
+        try:
+            return caches['template_fragments']
+        except InvalidCacheBackendError:
+            return caches['default']
+
+    def render(self, context):
+        expire_time = self.expire_time_var.resolve(context)
+        if expire_time is not None:
+            expire_time = int(expire_time)
+        # Фрагмент с реплики может быть старше версии в ключе, поэтому
+        # живёт не дольше её отставания.
+        lag = getattr(context.get('request'), 'replica_lag', 0)
+        if lag:
+            expire_time = lag if expire_time is None else min(
+                expire_time, lag
+            )
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        return get_or_compute(
+            make_template_fragment_key(self.fragment_name, vary_on),
+            lambda: self.nodelist.render(context),
+            expire_time,
+            cache=self.fragment_cache(context),
+        )
+
+
+@register.tag('cache')
+def do_cache(parser, token):
+    """Тот же синтаксис, что у {% cache %} из django.templatetags.cache."""
+    node = django_do_cache(parser, token)
+    return SingleFlightCacheNode(
+        node.nodelist, node.expire_time_var, node.fragment_name,
+        node.vary_on, node.cache_name,
+    )
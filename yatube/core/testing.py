@@ -0,0 +1,23 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .queries import QueryBudgetExceeded, QueryRecorder
+
+
+@contextmanager
+def assert_query_budget(max_queries=None, max_ms=None, repeat_limit=None):
+    """Проверка бюджета запросов для тестов.
+
+    with assert_query_budget(max_queries=5):
+        self.client.get(url)
+    """
+    if repeat_limit is None:
+        repeat_limit = settings.QUERY_BUDGET_REPEAT_LIMIT
+    with QueryRecorder(settings.QUERY_BUDGET_IGNORE) as recorder:
+        yield recorder
+    problems = recorder.problems(max_queries, max_ms, repeat_limit)
+    if problems:
+        raise QueryBudgetExceeded(
+            '; '.join(message for _, message in problems)
+        )
@@ -1,4 +1,36 @@
-from django.test import TestCase
+import os
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core import mail
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import (
+    Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase,
+    override_settings
+)
+from django.urls import reverse
+
+from posts.models import Post, User
+
+from . import auth, db, metrics, profiling, routers, sessions, tasks
+from .cache import L1, TwoTierCache
+from .models import Task
+from .single_flight import LOCK_KEY, get_or_compute
+from .queries import QueryBudgetExceeded, QueryRecorder, fingerprint
+from .testing import assert_query_budget
+
+app_name = 'posts'
+query_budgets = {'index': (0, 500)}
 
 
 class ViewTestClass(TestCase):
@@ -6,3 +38,558 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertTemplateUsed(response, 'core/404.html')
         self.assertEqual(response.status_code, 404)
+
+
+class QueryBudgetTests(TestCase):
+    def test_fingerprint_normalizes_literals(self):
+        """Литералы и списки IN не влияют на отпечаток запроса."""
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (1, 2, 3) AND s = 'x'"),
+            fingerprint("SELECT * FROM t WHERE id IN (7) AND s = 'yy'"),
+        )
+
+    def test_repeated_queries_are_reported(self):
+        """Повторяющийся запрос считается N+1."""
+        with QueryRecorder() as recorder:
+            for pk in range(5):
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT %s', [pk])
+        self.assertEqual(list(recorder.repeated(3).values()), [5])
+
+    def test_assert_query_budget(self):
+        """Тестовый помощник падает при превышении бюджета."""
+        cache.clear()
+        with self.assertRaises(QueryBudgetExceeded):
+            with assert_query_budget(max_queries=0):
+                self.client.get('/')
+
+    @override_settings(
+        QUERY_BUDGET_MODULES=['core.tests'], QUERY_BUDGET_RAISE=True
+    )
+    def test_middleware_enforces_budget(self):
+        """Middleware сверяет запрос с бюджетом его URL."""
+        cache.clear()
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get('/')
+
+
+class OtherProcessCache(TwoTierCache):
+    """Кэш «другого процесса»: свой L1 и своё имя в журнале."""
+    origin = 'other'
+
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        self.l1 = L1()
+        self.l1.seq = self.last_change()
+
+
+class TwoTierCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        location = os.path.join(directory, 'cache.sqlite3')
+        params = {'OPTIONS': {'POLL_INTERVAL': 0, 'L1_MAX_ENTRIES': 2}}
+        self.cache = OtherProcessCache(location, params)
+        self.other = OtherProcessCache(location, params)
+        self.other.origin = 'another'
+
+    def test_tests_do_not_share_cache_file(self):
+        """Тесты пишут кэш во временный файл, а не в общий рабочий."""
+        self.assertNotEqual(
+            os.path.dirname(settings.CACHES['default']['LOCATION']),
+            settings.BASE_DIR
+        )
+
+    def test_repeated_reads_hit_l1(self):
+        """Повторное чтение берётся из памяти процесса."""
+        self.other.set('key', 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(self.cache.l1.stats['l2_hits'], 1)
+        self.assertEqual(self.cache.l1.stats['l1_hits'], 1)
+        ratios = self.cache.hit_ratios()
+        self.assertEqual(ratios['l1'], 0.5)
+
+    def test_writes_invalidate_other_processes(self):
+        """Запись, удаление и очистка в одном процессе видны в другом."""
+        self.cache.set('key', 1)
+        self.assertEqual(self.other.get('key'), 1)
+        self.cache.incr('key')
+        self.assertEqual(self.other.get('key'), 2)
+        self.cache.delete('key')
+        self.assertIsNone(self.other.get('key'))
+        self.cache.set('key', 3)
+        self.assertEqual(self.other.get('key'), 3)
+        self.cache.clear()
+        self.assertIsNone(self.other.get('key'))
+
+    def test_l1_is_bounded(self):
+        """L1 вытесняет давно не читанные ключи, L2 их хранит."""
+        self.cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(len(self.cache.l1.entries), 2)
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']),
+                         {'a': 1, 'b': 2, 'c': 3})
+
+    def test_add_and_expiry(self):
+        """add не перезаписывает ключ, истёкшие записи не отдаются."""
+        self.assertTrue(self.cache.add('key', 1))
+        self.assertFalse(self.other.add('key', 2))
+        self.cache.set('gone', 1, timeout=0)
+        self.assertIsNone(self.other.get('gone'))
+        self.assertTrue(self.other.add('gone', 2))
+
+
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.cache = TwoTierCache(
+            os.path.join(directory, 'cache.sqlite3'),
+            {'OPTIONS': {'POLL_INTERVAL': 0}}
+        )
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        time.sleep(0.1)
+        return self.calls
+
+    def get(self, **kwargs):
+        return get_or_compute(
+            'key', self.compute, 60, cache=self.cache, **kwargs
+        )
+
+    def test_missing_key_is_computed_once(self):
+        """Одновременные промахи пересчитывают значение один раз."""
+        barrier = threading.Barrier(8)
+        results = []
+
+        def worker():
+            barrier.wait()
+            results.append(self.get())
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [1] * 8)
+
+    def test_stale_value_served_while_revalidating(self):
+        """Пока другой запрос пересчитывает ключ, отдаётся старое
+        значение."""
+        self.cache.set('key', ('old', 0.1, time.time() - 1), 60)
+        self.cache.add(LOCK_KEY.format('key'), True)
+        self.assertEqual(self.get(), 'old')
+        self.assertEqual(self.calls, 0)
+        self.cache.delete(LOCK_KEY.format('key'))
+        self.assertEqual(self.get(), 1)
+
+    def test_early_expiration(self):
+        """Долгий пересчёт обновляет ключ раньше срока."""
+        self.cache.set('key', ('old', 10, time.time() + 1), 60)
+        self.assertEqual(self.get(beta=100), 1)
+        self.assertEqual(self.get(beta=0), 1)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.location = os.path.join(directory, 'metrics.sqlite3')
+        settings = override_settings(
+            METRICS_LOCATION=self.location, METRICS_TOKEN='secret'
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        metrics.clear()
+        cache.clear()
+
+    def get_metrics(self, **extra):
+        return self.client.get(
+            '/metrics/', HTTP_AUTHORIZATION='Bearer secret', **extra
+        )
+
+    def test_requests_are_recorded_per_url_name(self):
+        """Время, SQL, шаблоны и кэш пишутся с именем URL."""
+        self.client.get('/')
+        self.client.get('/')
+        content = self.get_metrics().content.decode()
+        view = 'view="posts:index"'
+        self.assertIn(
+            f'yatube_request_duration_seconds_count{{{view}}} 2', content
+        )
+        self.assertIn(
+            f'yatube_sql_queries_bucket{{{view},le="+Inf"}} 2', content
+        )
+        self.assertIn(
+            f'yatube_template_render_seconds_count{{{view}}} 2', content
+        )
+        self.assertIn(f'yatube_cache_hits_total{{{view}}}', content)
+        self.assertIn(f'yatube_cache_misses_total{{{view}}}', content)
+
+    def test_samples_of_all_processes_are_summed(self):
+        """Снимки разных процессов складываются."""
+        metrics.inc('yatube_cache_hits_total', 3, view='posts:index')
+        metrics.flush()
+        with sqlite3.connect(self.location) as db:
+            db.execute(
+                'INSERT INTO samples VALUES (?, ?, ?, ?, ?)',
+                ('other', 'yatube_cache_hits_total', 'view="posts:index"',
+                 'total', 2)
+            )
+        self.assertIn(
+            'yatube_cache_hits_total{view="posts:index"} 5', metrics.render()
+        )
+
+    def test_samples_of_dead_processes_are_merged(self):
+        """Снимки завершившихся процессов складываются в одну строку
+        и удаляются, их счётчики не теряются."""
+        process = subprocess.Popen(['true'])
+        process.wait()
+        with sqlite3.connect(self.location) as db:
+            db.execute(metrics.SCHEMA)
+            db.executemany(
+                'INSERT INTO samples VALUES (?, ?, ?, ?, ?)',
+                [(f'{process.pid}:{start}', 'yatube_cache_hits_total',
+                  'view="posts:index"', 'total', 2) for start in (1, 2)]
+            )
+        metrics.inc('yatube_cache_hits_total', 3, view='posts:index')
+        metrics.flush()
+        with sqlite3.connect(self.location) as db:
+            origins = {origin for origin, in db.execute(
+                'SELECT origin FROM samples'
+            )}
+        self.assertEqual(
+            origins, {metrics.MERGED_ORIGIN, metrics._state['origin']}
+        )
+        self.assertIn(
+            'yatube_cache_hits_total{view="posts:index"} 7', metrics.render()
+        )
+
+    def test_endpoint_is_restricted(self):
+        """Страница метрик открыта по токену с разрешённого адреса или
+        персоналу; одного адреса мало."""
+        self.assertEqual(self.get_metrics().status_code, 200)
+        self.assertEqual(
+            self.get_metrics(REMOTE_ADDR='192.0.2.1').status_code, 403
+        )
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        self.assertEqual(self.client.get(
+            '/metrics/', HTTP_AUTHORIZATION='Bearer wrong'
+        ).status_code, 403)
+        self.client.force_login(
+            User.objects.create_user(username='staff', is_staff=True)
+        )
+        self.assertEqual(self.client.get(
+            '/metrics/', REMOTE_ADDR='192.0.2.1'
+        ).status_code, 200)
+
+
+def busy_loop(seconds):
+    finish = time.perf_counter() + seconds
+    while time.perf_counter() < finish:
+        pass
+
+
+class ProfilerTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings = override_settings(
+            PROFILER_DIR=self.directory, PROFILER_INTERVAL=0.001
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def profile(self, name):
+        profile = profiling.Profile(name)
+        profile.start()
+        busy_loop(0.05)
+        profile.stop()
+
+    def test_samples_are_written_as_collapsed_stacks(self):
+        """Стек начинается с имени URL и доходит до текущей функции."""
+        self.profile('posts:index')
+        stacks = profiling.read(os.path.join(
+            self.directory, f'posts:index.{os.getpid()}{profiling.SUFFIX}'
+        ))
+        self.assertTrue(stacks)
+        for stack in stacks:
+            frames = stack.split(';')
+            self.assertEqual(frames[0], 'posts:index')
+            self.assertIn('core/tests.py:busy_loop', frames)
+
+    def test_header_enables_profiling(self):
+        """Заголовок X-Profile с токеном включает профилирование
+        запроса."""
+        # Быстрый запрос может закончиться раньше первого снимка стеков,
+        # поэтому проверяется запуск профиля, а не файл.
+        with mock.patch.object(profiling.Profile, 'start') as start:
+            with override_settings(PROFILER_TOKEN='secret'):
+                self.client.get('/about/author/', HTTP_X_PROFILE='1')
+                self.assertFalse(start.called)
+                self.client.get('/about/author/', HTTP_X_PROFILE='secret')
+                self.assertEqual(start.call_count, 1)
+            self.client.get('/about/author/')
+        self.assertEqual(start.call_count, 1)
+
+    def test_merge_profiles_sums_processes(self):
+        """Команда складывает одинаковые стеки разных процессов."""
+        for pid in (1, 2):
+            path = os.path.join(self.directory, f'posts:profile.{pid}.folded')
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write('posts:profile;a;b 2\nposts:profile;a 1\n')
+        output = StringIO()
+        call_command(
+            'merge_profiles', 'posts:profile', directory=self.directory,
+            stdout=output, stderr=StringIO()
+        )
+        self.assertEqual(
+            output.getvalue(), 'posts:profile;a 2\nposts:profile;a;b 4\n'
+        )
+
+
+class SQLiteTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied(self):
+        """Новое подключение получает PRAGMA из настроек."""
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), 20000)
+        self.assertEqual(self.pragma('cache_size'), -64000)
+
+    def test_write_queue_admits_one_thread_at_a_time(self):
+        """Потоки проходят очередь по одному."""
+        queue = db.WriteQueue()
+        inside, peak = [], []
+
+        def write():
+            with queue:
+                inside.append(1)
+                peak.append(len(inside))
+                time.sleep(0.01)
+                inside.pop()
+
+        threads = [threading.Thread(target=write) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(peak, [1] * 5)
+
+    def test_write_queue_timeout_skips_ticket(self):
+        """Не дождавшийся поток идёт без очереди, а его билет не
+        задерживает следующих."""
+        queue = db.WriteQueue()
+        queue.acquire()
+        waited = []
+        thread = threading.Thread(
+            target=lambda: waited.append(queue.acquire(timeout=0.01))
+        )
+        thread.start()
+        thread.join()
+        self.assertEqual(waited, [False])
+        queue.release()
+        self.assertTrue(queue.acquire(timeout=0))
+        queue.release()
+
+
+class WriteQueueBackendTests(TransactionTestCase):
+    def setUp(self):
+        self.queue = db.write_queue(connection.settings_dict['NAME'])
+
+    def held(self):
+        return self.queue.issued - self.queue.serving
+
+    def test_queue_is_held_only_inside_transaction(self):
+        """Очередь занята от начала транзакции до её конца."""
+        self.assertEqual(self.held(), 0)
+        with transaction.atomic():
+            self.assertEqual(self.held(), 1)
+            User.objects.create_user(username='auth')
+        self.assertEqual(self.held(), 0)
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                raise ValueError
+        self.assertEqual(self.held(), 0)
+
+    def test_get_that_writes_uses_queue(self):
+        """Подписка по GET пишет в очереди и отпускает её."""
+        user = User.objects.create_user(username='auth')
+        User.objects.create_user(username='author')
+        client = Client()
+        client.force_login(user)
+        issued = self.queue.issued
+        client.get(reverse('posts:profile_follow', args=('author',)))
+        self.assertGreater(self.queue.issued, issued)
+        self.assertEqual(self.held(), 0)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = routers.ReplicaRouter()
+        self.user = User.objects.create_user(username='auth')
+        self.post = Post.objects.create(author=self.user, text='Пост')
+
+    def test_only_marked_views_read_from_replica(self):
+        """Реплика читается только в помеченных представлениях, запись
+        всегда идёт в основную базу."""
+        request = RequestFactory().get('/')
+        request.user = self.user
+        with routers.RequestState(request) as state:
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+            state.replica = True
+            self.assertEqual(self.router.db_for_read(Post), 'replica')
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+            self.assertTrue(state.wrote)
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_writer_reads_from_primary(self):
+        """После своей записи пользователь читает из основной базы."""
+        self.client.force_login(self.user)
+        self.client.post(
+            reverse('posts:add_comment', args=(self.post.id,)),
+            {'text': 'Комментарий'}
+        )
+        self.assertTrue(routers.sticky(self.user))
+        # Реплики replica нет: запрос к ней закончился бы ошибкой.
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.id,))
+        )
+        self.assertContains(response, 'Комментарий')
+
+
+class CachedSessionTests(TestCase):
+    password = 'Zx9-cached-session'
+
+    def setUp(self):
+        cache.clear()
+        sessions.flush()
+        self.user = User.objects.create_user(
+            username='auth', password=self.password
+        )
+        self.client.login(username='auth', password=self.password)
+
+    def test_cache_hits_need_no_queries(self):
+        """Сессия и пользователь берутся из кэша без запросов к базе."""
+        url = reverse('about:author')
+        self.client.get(url)
+        with assert_query_budget(max_queries=0):
+            response = self.client.get(url)
+        self.assertContains(response, 'Пользователь: auth')
+
+    def test_sessions_are_written_behind(self):
+        """Сессия попадает в базу пачкой и переживает очистку кэша."""
+        key = self.client.session.session_key
+        self.assertFalse(Session.objects.filter(pk=key).exists())
+        self.assertEqual(sessions.flush(), 1)
+        self.assertTrue(Session.objects.filter(pk=key).exists())
+        cache.clear()
+        response = self.client.get(reverse('about:author'))
+        self.assertContains(response, 'Пользователь: auth')
+
+    def test_password_change_ends_other_sessions(self):
+        """Смена пароля сбрасывает пользователя в кэше: другие сессии
+        завершаются, а сменившая пароль остаётся."""
+        other = Client()
+        other.login(username='auth', password=self.password)
+        url = reverse('about:author')
+        other.get(url)
+        self.assertIsNotNone(cache.get(auth.USER_KEY.format(self.user.pk)))
+        self.client.post(reverse('users:passwordchange'), {
+            'old_password': self.password,
+            'new_password1': 'Zx9-changed-password',
+            'new_password2': 'Zx9-changed-password',
+        })
+        self.assertContains(self.client.get(url), 'Пользователь: auth')
+        self.assertNotContains(other.get(url), 'Пользователь: auth')
+
+
+done = []
+
+
+@tasks.task('tests.batch', batch_size=2)
+def batch_task(params):
+    done.append([item['number'] for item in params])
+
+
+@tasks.task('tests.partial', batch_size=3)
+def partial_task(params):
+    failed = [item for item in params if item['number'] % 2]
+    done.append([item['number'] for item in params if item not in failed])
+    if failed:
+        raise tasks.PartialFailure(failed, ValueError('нечётное'))
+
+
+@tasks.task('tests.flaky', max_attempts=2)
+def flaky_task():
+    raise ValueError('сбой')
+
+
+class TaskTests(TestCase):
+    def setUp(self):
+        done.clear()
+
+    def test_key_enqueues_once(self):
+        """Повтор задачи с тем же ключом не создаёт новую."""
+        tasks.enqueue('tests.batch', {'number': 1}, key='one')
+        tasks.enqueue('tests.batch', {'number': 2}, key='one')
+        tasks.run()
+        self.assertEqual(done, [[1]])
+
+    def test_batches_follow_priority(self):
+        """Задачи выполняются пачками, важные раньше."""
+        for number in range(3):
+            tasks.enqueue('tests.batch', {'number': number})
+        tasks.enqueue('tests.batch', {'number': 3}, priority=1)
+        self.assertEqual(tasks.run(), 2)
+        self.assertEqual(done, [[3, 0], [1, 2]])
+        self.assertEqual(Task.objects.filter(status=Task.DONE).count(), 4)
+
+    def test_failed_task_is_retried_with_backoff(self):
+        """Упавшая задача откладывается, а после последней попытки
+        отмечается невыполненной."""
+        tasks.enqueue('tests.flaky')
+        queued = Task.objects.get()
+        tasks.run()
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.PENDING)
+        self.assertEqual(queued.attempts, 1)
+        self.assertIn('сбой', queued.error)
+        self.assertGreater(queued.run_at, queued.created)
+        Task.objects.filter(pk=queued.pk).update(run_at=queued.created)
+        tasks.run()
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.FAILED)
+        self.assertEqual(queued.attempts, 2)
+
+    def test_partial_failure_retries_only_failed_tasks(self):
+        """Из пачки откладываются только невыполненные задачи."""
+        for number in range(3):
+            tasks.enqueue('tests.partial', {'number': number})
+        tasks.run()
+        self.assertEqual(done, [[0, 2]])
+        self.assertEqual(
+            list(Task.objects.order_by('pk').values_list('status', flat=True)),
+            [Task.DONE, Task.PENDING, Task.DONE]
+        )
+        self.assertIn('нечётное', Task.objects.get(status=Task.PENDING).error)
+
+    @override_settings(
+        EMAIL_BACKEND='core.mail.QueuedEmailBackend',
+        TASKS_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'
+    )
+    def test_email_is_sent_by_task(self):
+        """Письмо уходит только при выполнении задачи."""
+        mail.send_mail('Тема', 'Текст', 'from@example.com', ['to@example.com'])
+        self.assertEqual(len(mail.outbox), 0)
+        tasks.run()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Тема')
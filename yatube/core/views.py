@@ -1,5 +1,11 @@
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import render
 
+from . import auth
+from . import metrics as request_metrics
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +21,22 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def metrics(request):
+    """Метрики всех процессов в текстовом формате Prometheus.
+
+    Сборщик предъявляет METRICS_TOKEN в заголовке
+    Authorization: Bearer.
+    """
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    scheme, _, secret = header.partition(' ')
+    if scheme != 'Bearer':
+        secret = ''
+    if not auth.is_trusted(request, secret, settings.METRICS_TOKEN,
+                           settings.METRICS_ALLOWED_IPS):
+        raise PermissionDenied
+    return HttpResponse(
+        request_metrics.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -0,0 +1,103 @@
+"""ZIP-архив данных пользователя, который собирается по ходу отдачи.
+
+Посты, комментарии и подписки пишутся в архив строками NDJSON по мере
+чтения из базы через .iterator(), картинки постов — кусками из
+хранилища. Готовые байты архива отдаются, как только их набирается
+CHUNK_SIZE, поэтому память не зависит от размера аккаунта.
+"""
+import json
+import time
+import zipfile
+
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment, Follow
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _Buffer:
+    """Файл только для записи: zipfile пишет в него без перемотки,
+    а архив забирает накопленное."""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self, minimum=0):
+        if self.size < minimum or not self.size:
+            return None
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        self.size = 0
+        return data
+
+
+def tables(user, chunk_size):
+    """Файлы NDJSON архива: имя -> строки."""
+    return {
+        'posts.ndjson': user.posts.order_by('pk').values(
+            'id', 'text', 'pub_date', 'updated', 'group__slug', 'image'
+        ).iterator(chunk_size=chunk_size),
+        'comments.ndjson': Comment.objects.filter(
+            author=user
+        ).order_by('pk').values(
+            'id', 'post_id', 'text', 'created'
+        ).iterator(chunk_size=chunk_size),
+        'follows.ndjson': Follow.objects.filter(
+            user=user
+        ).order_by('pk').values(
+            'author__username'
+        ).iterator(chunk_size=chunk_size),
+    }
+
+
+def user_archive(user, chunk_size=500):
+    """Отдаёт ZIP-архив данных пользователя кусками байтов."""
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, rows in tables(user, chunk_size).items():
+            # Размер файла заранее не известен.
+            with archive.open(name, 'w', force_zip64=True) as file:
+                for row in rows:
+                    file.write(json.dumps(
+                        row, cls=DjangoJSONEncoder, ensure_ascii=False
+                    ).encode() + b'\n')
+                    data = buffer.take(CHUNK_SIZE)
+                    if data:
+                        yield data
+        images = user.posts.exclude(image='').order_by(
+            'image'
+        ).values_list('image', flat=True).distinct().iterator(
+            chunk_size=chunk_size
+        )
+        for image in images:
+            yield from _pack(archive, buffer, image)
+    data = buffer.take()
+    if data:
+        yield data
+
+
+def _pack(archive, buffer, name):
+    if not default_storage.exists(name):
+        return
+    info = zipfile.ZipInfo(f'images/{name}', time.localtime()[:6])
+    # Картинки уже сжаты.
+    info.compress_type = zipfile.ZIP_STORED
+    info.file_size = default_storage.size(name)
+    with default_storage.open(name) as image, \
+            archive.open(info, 'w') as file:
+        for chunk in image.chunks():
+            file.write(chunk)
+            data = buffer.take(CHUNK_SIZE)
+            if data:
+                yield data
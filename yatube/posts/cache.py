@@ -0,0 +1,73 @@
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from core import page_cache
+
+VERSION_KEY = 'posts:version:{}'
+MODIFIED_KEY = 'posts:modified:{}'
+
+
+def _initial_version():
+    # Версия, начатая с текущего времени, не повторяет старые значения,
+    # даже если ключ был вытеснен из кэша.
+    return int(time.time() * 1000)
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _initial_version(), None)
+
+
+def _bump(scope):
+    _incr(VERSION_KEY.format(scope))
+    cache.set(MODIFIED_KEY.format(scope), time.time(), None)
+
+
+def bump(scope):
+    """Сбрасывает все фрагменты, закэшированные для области scope."""
+    _bump(scope)
+    if connection.in_atomic_block:
+        # Повторный сброс после коммита убирает фрагменты, которые успели
+        # отрисовать по данным до фиксации транзакции.
+        transaction.on_commit(lambda: _bump(scope))
+
+
+def reset_pages():
+    """Сбрасывает все фрагменты и страницы после записи мимо сигналов.
+    Сессии и пользователи в том же кэше остаются."""
+    bump('posts')
+    bump('names')
+    page_cache.purge(page_cache.ALL)
+
+
+def feed_version(*scopes):
+    """Текущая версия ленты, собранная из версий областей одним запросом."""
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _initial_version(), None)
+            versions[key] = cache.get(key)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def scope_modified(scope):
+    """Время последнего сброса области; если оно пропало из кэша, отсчёт
+    начинается с текущего момента."""
+    key = MODIFIED_KEY.format(scope)
+    cache.add(key, time.time(), None)
+    return datetime.fromtimestamp(cache.get(key), timezone.utc)
+
+
+def feed_modified(*scopes):
+    """Время последнего сброса областей или None, если оно неизвестно."""
+    keys = [MODIFIED_KEY.format(scope) for scope in scopes]
+    times = cache.get_many(keys)
+    if len(times) < len(keys):
+        return None
+    return datetime.fromtimestamp(max(times.values()), timezone.utc)
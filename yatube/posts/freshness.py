@@ -0,0 +1,58 @@
+"""Состояние страниц для условного GET (core.conditional).
+
+Ленты описываются версиями областей кэша из posts.cache и не читают
+посты, страница поста — одной строкой поста со счётчиками и версией
+области names: её сбрасывает переименование пользователя или группы,
+ведь имена комментаторов в строку поста не входят.
+"""
+from django.db.models import Max
+
+from .cache import feed_modified, feed_version, scope_modified
+from .models import Post
+
+
+def _scopes(*scopes):
+    return feed_version(*scopes), feed_modified(*scopes)
+
+
+def feed(request, *args, **kwargs):
+    return _scopes('posts')
+
+
+def profile(request, username):
+    if request.user.is_authenticated:
+        # От подписок зависит кнопка «Подписаться».
+        return _scopes('posts', f'follow:{request.user.id}')
+    return _scopes('posts')
+
+
+def follow(request):
+    return _scopes('posts', f'follow:{request.user.id}')
+
+
+POST_FIELDS = (
+    'updated',
+    'comments_count',
+    'author__profile__posts_count',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'group__title',
+    'group__slug',
+)
+
+
+def post(request, post_id):
+    row = Post.objects.filter(pk=post_id).values(*POST_FIELDS).annotate(
+        last_comment=Max('comments__created')
+    ).first()
+    if row is None:
+        return None, None
+    version = ':'.join((
+        *(str(row[field]) for field in (*POST_FIELDS, 'last_comment')),
+        feed_version('names'),
+    ))
+    modified = max(filter(None, (
+        row['updated'], row['last_comment'], scope_modified('names')
+    )))
+    return version, modified
@@ -0,0 +1,35 @@
+"""Личные части страниц постов, см. core.holes."""
+from core.holes import register
+from .forms import CommentForm
+from .models import Follow
+
+
+@register('switcher', 'posts/includes/switcher.html')
+def switcher(request):
+    return {}
+
+
+@register('follow_button', 'posts/includes/follow_button.html')
+def follow_button(request, author_id, username):
+    following = (
+        request.user.is_authenticated
+        and request.user.pk != author_id
+        and Follow.objects.filter(
+            user=request.user, author_id=author_id
+        ).exists()
+    )
+    return {
+        'author_id': author_id,
+        'username': username,
+        'following': following,
+    }
+
+
+@register('post_edit', 'posts/includes/post_edit.html')
+def post_edit(request, post_id, author_id):
+    return {'post_id': post_id, 'author_id': author_id}
+
+
+@register('comment_form', 'includes/comment_form.html')
+def comment_form(request, post_id):
+    return {'post_id': post_id, 'form': CommentForm()}
@@ -0,0 +1,167 @@
+import json
+import logging
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from posts import cache
+from posts.models import Comment, Post, User
+
+from .benchmark_views import REMOTE_ADDR, percentile
+
+MARKER = 'Запись нагрузочного замера'
+# Режим -> (журнал, настройки). «До» — настройки SQLite по умолчанию.
+MODES = {
+    'plain': ('DELETE', {
+        'SQLITE_PRAGMAS': {},
+        'SQLITE_IMMEDIATE_TRANSACTIONS': False,
+        'SQLITE_SERIALIZE_WRITES': False,
+    }),
+    'tuned': ('WAL', {}),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Смешанная нагрузка чтения и записи из нескольких потоков на файл '
+        'базы: пропускная способность, задержки и ошибки «database is '
+        'locked» без настроек SQLite (plain) и с ними (tuned). Созданные '
+        'посты и комментарии удаляются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument(
+            '--requests', type=int, default=100,
+            help='Запросов на поток.'
+        )
+        parser.add_argument(
+            '--writes', type=float, default=0.2,
+            help='Доля пишущих запросов.'
+        )
+        parser.add_argument(
+            '--mode', choices=(*MODES, 'both'), default='both'
+        )
+        parser.add_argument('--output', help='JSON с результатом.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.options = options
+        users = list(User.objects.order_by('-profile__posts_count')[
+            :options['threads']
+        ])
+        self.posts = list(Post.objects.values_list('id', flat=True)[:500])
+        if not self.posts:
+            raise CommandError(
+                'В базе нет постов; заполните её командой seed_data.'
+            )
+        self.authors = [user.username for user in users]
+        modes = MODES if options['mode'] == 'both' else [options['mode']]
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        results = {}
+        try:
+            for mode in modes:
+                journal_mode, overrides = MODES[mode]
+                # Журнал переключается, пока к базе никто не подключён.
+                connections.close_all()
+                with connection.cursor() as cursor:
+                    cursor.execute(f'PRAGMA journal_mode = {journal_mode}')
+                connections.close_all()
+                with override_settings(QUERY_BUDGET_RAISE=False, **overrides):
+                    results[mode] = self.run(users)
+                connections.close_all()
+                self.report(mode, results[mode])
+        finally:
+            request_logger.setLevel(level)
+            Comment.objects.filter(text=MARKER).delete()
+            Post.objects.filter(text=MARKER).delete()
+            cache.reset_pages()
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+
+    def run(self, users):
+        timings = {'read': [], 'write': []}
+        errors = []
+        threads = [
+            threading.Thread(
+                target=self.worker,
+                args=(user, self.options['seed'] + number, timings, errors)
+            )
+            for number, user in enumerate(users)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        total = sum(len(values) for values in timings.values())
+        result = {
+            'requests': total,
+            'errors': len(errors),
+            'rps': round(total / elapsed, 1),
+        }
+        for kind, values in timings.items():
+            values.sort()
+            if values:
+                result[f'{kind}_p50_ms'] = round(percentile(values, 0.5), 3)
+                result[f'{kind}_p95_ms'] = round(percentile(values, 0.95), 3)
+        result['error_examples'] = sorted(set(errors))[:3]
+        return result
+
+    def worker(self, user, seed, timings, errors):
+        generator = random.Random(seed)
+        client = Client(REMOTE_ADDR=REMOTE_ADDR)
+        client.force_login(user)
+        try:
+            for _ in range(self.options['requests']):
+                kind = (
+                    'write' if generator.random() < self.options['writes']
+                    else 'read'
+                )
+                method, url, data = self.choose(generator, kind)
+                started = time.perf_counter()
+                try:
+                    response = getattr(client, method)(url, data)
+                except Exception as error:
+                    errors.append(str(error))
+                    continue
+                elapsed = (time.perf_counter() - started) * 1000
+                if response.status_code >= 500:
+                    errors.append(f'HTTP {response.status_code}')
+                    continue
+                timings[kind].append(elapsed)
+        finally:
+            connections.close_all()
+
+    def choose(self, generator, kind):
+        post_id = generator.choice(self.posts)
+        if kind == 'write':
+            if generator.random() < 0.5:
+                return 'post', reverse('posts:post_create'), {'text': MARKER}
+            return 'post', reverse(
+                'posts:add_comment', args=(post_id,)
+            ), {'text': MARKER}
+        return 'get', generator.choice((
+            reverse('posts:index'),
+            reverse('posts:post_detail', args=(post_id,)),
+            reverse('posts:profile', args=(generator.choice(self.authors),)),
+        )), None
+
+    def report(self, mode, result):
+        self.stdout.write(
+            f'{mode}: {result["rps"]} запросов/с, '
+            f'чтение p95 {result.get("read_p95_ms", 0):.1f} мс, '
+            f'запись p95 {result.get("write_p95_ms", 0):.1f} мс, '
+            f'ошибок {result["errors"]}'
+        )
+        for example in result['error_examples']:
+            self.stdout.write(f'  {example}')
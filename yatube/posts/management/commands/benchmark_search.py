@@ -0,0 +1,112 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Post, User
+from posts.search import find_posts, rebuild
+
+WORDS = (
+    'пост', 'посты', 'новости', 'новость', 'город', 'города', 'лето',
+    'летом', 'зима', 'зимой', 'кошка', 'кошки', 'собака', 'собаки',
+    'книга', 'книги', 'читать', 'читаю', 'прочитал', 'программа',
+    'программы', 'питон', 'django', 'python', 'база', 'данных', 'запрос',
+    'запросы', 'индекс', 'поиск', 'искать', 'нашёл', 'музыка', 'песня',
+    'песни', 'концерт', 'фильм', 'фильмы', 'смотреть', 'погода', 'дождь',
+    'солнце', 'море', 'горы', 'путешествие', 'путешествия', 'поезд',
+    'самолёт', 'работа', 'работаю', 'отпуск', 'друзья', 'встреча',
+    'красивый', 'красивая', 'интересный', 'интересная', 'быстрый',
+    'медленный', 'странный', 'редкий', 'эксперимент', 'фотография',
+)
+WEIGHTS = [1 / rank for rank in range(1, len(WORDS) + 1)]
+
+
+def synthetic_text(tags, words=20):
+    """Частые слова по закону Ципфа и один редкий тег на пост."""
+    words = random.choices(WORDS, WEIGHTS, k=words)
+    return ' '.join(words + [f'тег{random.randrange(tags)}'])
+
+
+def synthetic_query(tags):
+    if random.random() < 0.5:
+        return f'тег{random.randrange(tags)}'
+    return ' '.join(random.sample(WORDS, random.randint(1, 2)))
+
+
+def timings(run, queries):
+    result = []
+    for query in queries:
+        started = time.perf_counter()
+        run(query)
+        result.append((time.perf_counter() - started) * 1000)
+    result.sort()
+    return result
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время поиска по индексу и через LIKE, при необходимости '
+        'добавив синтетические посты (по умолчанию изменения откатываются).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=0)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--keep', action='store_true')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['posts']:
+                self.generate(options['posts'], options['batch_size'])
+            tags = max(Post.objects.count() // 100, 1)
+            queries = [
+                synthetic_query(tags) for _ in range(options['queries'])
+            ]
+            self.report('индекс', timings(self.search_index, queries))
+            self.report('LIKE', timings(self.search_like, queries))
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def generate(self, count, batch_size):
+        author, _ = User.objects.get_or_create(username='benchmark')
+        tags = max((Post.objects.count() + count) // 100, 1)
+        started = time.perf_counter()
+        for start in range(0, count, batch_size):
+            Post.objects.bulk_create(
+                Post(author=author, text=synthetic_text(tags))
+                for _ in range(min(batch_size, count - start))
+            )
+        terms = rebuild(batch_size=batch_size)
+        self.stdout.write(
+            f'Добавлено постов: {count}, термов в индексе: {terms}, '
+            f'{time.perf_counter() - started:.1f} с'
+        )
+
+    @staticmethod
+    def search_index(query):
+        return list(
+            find_posts(query).order_by('-found_date', '-id')[:10]
+            .values_list('id', flat=True)
+        )
+
+    @staticmethod
+    def search_like(query):
+        posts = Post.objects.all()
+        for word in query.split():
+            posts = posts.filter(text__contains=word)
+        return list(
+            posts.order_by('-pub_date', '-id')[:10]
+            .values_list('id', flat=True)
+        )
+
+    def report(self, name, result):
+        def percentile(share):
+            return result[min(int(len(result) * share), len(result) - 1)]
+
+        self.stdout.write(
+            f'{name}: среднее {sum(result) / len(result):.2f} мс, '
+            f'p50 {percentile(0.5):.2f} мс, p95 {percentile(0.95):.2f} мс, '
+            f'максимум {result[-1]:.2f} мс'
+        )
@@ -0,0 +1,241 @@
+import json
+import logging
+import random
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import cache, urls
+from posts.models import Follow, Group, Post, User
+
+POOL_SIZE = 100
+# Адрес не из INTERNAL_IPS, чтобы debug_toolbar не попадал в замеры.
+REMOTE_ADDR = '192.0.2.1'
+# Меньшие расхождения p95 считаются шумом.
+MIN_REGRESSION_MS = 1.0
+REQUESTS = {
+    'add_comment': ('post', {'text': 'Комментарий для замера'}),
+}
+
+
+def percentile(result, share):
+    return result[min(int(len(result) * share), len(result) - 1)]
+
+
+def summary(timings, queries, statuses):
+    timings = sorted(timings)
+    return {
+        'requests': len(timings),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'p50_ms': round(percentile(timings, 0.5), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'queries': max(queries),
+        'statuses': dict(statuses),
+    }
+
+
+def regressions(results, baseline, tolerance):
+    """Адреса, где p95 вырос больше чем на tolerance или стало больше
+    SQL-запросов, чем в базовых замерах."""
+    found = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        limit = base['p95_ms'] * (1 + tolerance)
+        if (result['p95_ms'] > limit
+                and result['p95_ms'] - base['p95_ms'] > MIN_REGRESSION_MS):
+            found.append(
+                f'{name}: p95 {result["p95_ms"]:.2f} мс '
+                f'(было {base["p95_ms"]:.2f} мс)'
+            )
+        if result['queries'] > base['queries']:
+            found.append(
+                f'{name}: запросов {result["queries"]} '
+                f'(было {base["queries"]})'
+            )
+    return found
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку и число SQL-запросов для всех адресов '
+        'posts/urls.py, пишет результат в JSON и сравнивает с базовыми '
+        'замерами. Изменения в базе откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--output', default='benchmark.json')
+        parser.add_argument(
+            '--baseline', default=settings.BENCHMARK_BASELINE,
+            help='JSON с базовыми замерами для сравнения.'
+        )
+        parser.add_argument(
+            '--update-baseline', action='store_true',
+            help='Сохранить результат как новые базовые замеры.'
+        )
+        parser.add_argument('--tolerance', type=float, default=0.25)
+        parser.add_argument(
+            '--user', help='Пользователь запросов; по умолчанию самый '
+                           'активный автор.'
+        )
+        parser.add_argument('--guest', action='store_true')
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.options = options
+        # Ответы 4xx учитываются в statuses, в журнал они не нужны.
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+        try:
+            with override_settings(QUERY_BUDGET_RAISE=False):
+                with transaction.atomic():
+                    results = self.run()
+                    transaction.set_rollback(True)
+        finally:
+            request_logger.setLevel(level)
+        # В кэше остались страницы и версии по откаченным данным.
+        cache.reset_pages()
+        report = {
+            'created': timezone.now().isoformat(),
+            'options': {
+                name: options[name]
+                for name in ('requests', 'warmup', 'guest', 'cold', 'seed')
+            },
+            'routes': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        self.stdout.write(f'Результат записан в {options["output"]}')
+        self.compare(results)
+
+    def run(self):
+        user = self.get_user()
+        self.pools = self.get_pools(user)
+        client = Client(REMOTE_ADDR=REMOTE_ADDR)
+        self.user = None
+        if not self.options['guest']:
+            client.force_login(user)
+            self.user = user
+        results = {}
+        for pattern in urls.urlpatterns:
+            name = f'{urls.app_name}:{pattern.name}'
+            method, data = REQUESTS.get(pattern.name, ('get', None))
+            params = list(pattern.pattern.converters)
+            for _ in range(self.options['warmup']):
+                self.request(client, method, name, params, data)
+            timings, queries, statuses = [], [], Counter()
+            for _ in range(self.options['requests']):
+                elapsed, count, status = self.request(
+                    client, method, name, params, data
+                )
+                timings.append(elapsed)
+                queries.append(count)
+                statuses[status] += 1
+            results[name] = summary(timings, queries, statuses)
+            self.stdout.write(
+                f'{name}: p50 {results[name]["p50_ms"]:.2f} мс, '
+                f'p95 {results[name]["p95_ms"]:.2f} мс, '
+                f'p99 {results[name]["p99_ms"]:.2f} мс, '
+                f'запросов {results[name]["queries"]}'
+            )
+        return results
+
+    def request(self, client, method, name, params, data):
+        kwargs = {
+            param: self.random.choice(self.pools[(name, param)])
+            for param in params
+        }
+        if (name == f'{urls.app_name}:profile_unfollow'
+                and self.user is not None):
+            # Отписка каждый раз должна находить подписку.
+            Follow.objects.get_or_create(
+                user=self.user,
+                author=User.objects.get(username=kwargs['username'])
+            )
+        url = reverse(name, kwargs=kwargs)
+        if self.options['cold']:
+            cache.reset_pages()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = getattr(client, method)(url, data)
+            elapsed = (time.perf_counter() - started) * 1000
+        return elapsed, len(captured), response.status_code
+
+    def get_user(self):
+        if self.options['user']:
+            try:
+                return User.objects.get(username=self.options['user'])
+            except User.DoesNotExist:
+                raise CommandError(
+                    f'Пользователь {self.options["user"]} не найден.'
+                )
+        user = User.objects.order_by('-profile__posts_count').first()
+        if user is None or not Post.objects.exists():
+            raise CommandError(
+                'В базе нет постов; заполните её командой seed_data.'
+            )
+        return user
+
+    def get_pools(self, user):
+        """Значения параметров адресов: популярные группы, авторы
+        и свежие посты; для правки — посты пользователя, для отписки —
+        авторы, на которых он подписан."""
+        posts = list(Post.objects.values_list('id', flat=True)[:POOL_SIZE])
+        own = list(user.posts.values_list('id', flat=True)[:POOL_SIZE])
+        authors = list(User.objects.exclude(pk=user.pk).order_by(
+            '-profile__followers_count'
+        ).values_list('username', flat=True)[:POOL_SIZE])
+        followed = list(Follow.objects.filter(user=user).values_list(
+            'author__username', flat=True
+        )[:POOL_SIZE])
+        groups = list(Group.objects.order_by('-posts_count').values_list(
+            'slug', flat=True
+        )[:POOL_SIZE])
+        pools = {}
+        for pattern in urls.urlpatterns:
+            name = f'{urls.app_name}:{pattern.name}'
+            pools[(name, 'slug')] = groups
+            pools[(name, 'username')] = authors
+            pools[(name, 'post_id')] = posts
+        pools[(f'{urls.app_name}:post_edit', 'post_id')] = own or posts
+        pools[(f'{urls.app_name}:profile_unfollow', 'username')] = (
+            followed or authors
+        )
+        return pools
+
+    def compare(self, results):
+        baseline_path = self.options['baseline']
+        if self.options['update_baseline']:
+            with open(baseline_path, 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Базовые замеры обновлены: {baseline_path}')
+            return
+        try:
+            with open(baseline_path, encoding='utf-8') as file:
+                baseline = json.load(file)
+        except FileNotFoundError:
+            self.stdout.write(
+                f'Базовых замеров {baseline_path} нет, сравнение пропущено.'
+            )
+            return
+        found = regressions(results, baseline, self.options['tolerance'])
+        if found:
+            raise CommandError('Регрессии:\n' + '\n'.join(found))
+        self.stdout.write('Регрессий нет.')
@@ -0,0 +1,92 @@
+import csv
+import json
+import tarfile
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.models import Post
+
+# Поля строки выгрузки; автор и группа — по username и slug.
+FIELDS = ('author', 'group', 'text', 'pub_date', 'image')
+FORMATS = ('jsonl', 'csv')
+
+
+def get_format(path, chosen):
+    """Формат из параметра --format или из расширения файла."""
+    name = chosen or path.rsplit('.', 1)[-1].lower()
+    if name not in FORMATS:
+        raise CommandError(
+            f'Неизвестный формат {name}; укажите --format '
+            f'{" или ".join(FORMATS)}.'
+        )
+    return name
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты в JSONL или CSV потоком: память не растёт с '
+        'числом постов. Картинки можно упаковать в tar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Файл или - для stdout.')
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument('--images', help='tar-архив для картинок.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        output = options['output']
+        file_format = get_format(
+            output, options['format'] or (output == '-' and 'jsonl')
+        )
+        started = time.perf_counter()
+        rows = Post.objects.order_by('pk').values_list(
+            'author__username', 'group__slug', 'text', 'pub_date', 'image'
+        ).iterator(chunk_size=options['chunk_size'])
+        file = (
+            self.stdout if output == '-'
+            else open(output, 'w', encoding='utf-8', newline='')
+        )
+        archive = options['images'] and tarfile.open(options['images'], 'w')
+        try:
+            count = self.write(file, file_format, rows, archive)
+        finally:
+            if output != '-':
+                file.close()
+            if archive:
+                archive.close()
+        self.stderr.write(
+            f'Постов: {count} за {time.perf_counter() - started:.1f} с'
+        )
+
+    def write(self, file, file_format, rows, archive):
+        writer = csv.writer(file) if file_format == 'csv' else None
+        if writer:
+            writer.writerow(FIELDS)
+        packed = set()
+        count = 0
+        for author, group, text, pub_date, image in rows:
+            row = (author, group or '', text, pub_date.isoformat(), image)
+            if writer:
+                writer.writerow(row)
+            else:
+                file.write(
+                    json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False)
+                    + '\n'
+                )
+            if archive and image and image not in packed:
+                packed.add(image)
+                self.pack(archive, image)
+            count += 1
+        return count
+
+    def pack(self, archive, name):
+        if not default_storage.exists(name):
+            self.stderr.write(f'Нет файла картинки {name}')
+            return
+        info = tarfile.TarInfo(name)
+        info.size = default_storage.size(name)
+        with default_storage.open(name) as image:
+            archive.addfile(info, image)
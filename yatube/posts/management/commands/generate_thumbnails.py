@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts.thumbnails import generate_many, media_images
+
+
+class Command(BaseCommand):
+    help = 'Создаёт эскизы для картинок, уже загруженных в MEDIA_ROOT/posts/.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None)
+
+    def handle(self, *args, **options):
+        names = list(media_images())
+        done = generate_many(names, workers=options['workers'])
+        self.stdout.write(f'Эскизы созданы для {done} из {len(names)} файлов')
@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.single_flight import get_or_compute
+from posts.models import Post
+
+KEY = 'posts:load-test:index'
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает кэшированную первую страницу ленты из нескольких потоков '
+        'и выводит, сколько раз в секунду она считалась из базы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--seconds', type=int, default=10)
+        parser.add_argument('--timeout', type=int, default=2)
+        parser.add_argument(
+            '--naive', action='store_true',
+            help='Обычные get/set без защиты, для сравнения.'
+        )
+
+    def compute(self):
+        rows = [post.pk for post in Post.objects.for_feed()[:10]]
+        with self.lock:
+            self.computed[int(time.monotonic() - self.started)] += 1
+        return rows
+
+    def naive(self):
+        rows = cache.get(KEY)
+        if rows is None:
+            rows = self.compute()
+            cache.set(KEY, rows, self.timeout)
+        return rows
+
+    def worker(self, seconds, naive):
+        try:
+            while time.monotonic() - self.started < seconds:
+                if naive:
+                    self.naive()
+                else:
+                    get_or_compute(KEY, self.compute, self.timeout)
+        finally:
+            connection.close()
+
+    def handle(self, *args, **options):
+        self.computed = Counter()
+        self.lock = threading.Lock()
+        self.timeout = options['timeout']
+        cache.delete(KEY)
+        self.started = time.monotonic()
+        threads = [
+            threading.Thread(
+                target=self.worker,
+                args=(options['seconds'], options['naive'])
+            )
+            for _ in range(options['threads'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for second in range(options['seconds']):
+            count = self.computed[second]
+            self.stdout.write(
+                f'{second:>3} с: {count} пересчётов {"#" * count}'
+            )
+        self.stdout.write(f'Всего пересчётов: {sum(self.computed.values())}')
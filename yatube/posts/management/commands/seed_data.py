@@ -0,0 +1,246 @@
+import io
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+from mixer.backend.django import mixer
+from PIL import Image
+
+from posts import cache, search, thumbnails, timeline
+from posts.counters import reconcile
+from posts.models import Comment, Follow, Group, Post, User
+
+IMAGE_VARIANTS = 8
+IMAGE_SIZE = (96, 64)
+SEED_PASSWORD = 'seed-password'
+
+
+def power_law(count, skew):
+    """Накопленные веса 1 / rank ** skew для random.choices."""
+    total, weights = 0, []
+    for rank in range(1, count + 1):
+        total += 1 / rank ** skew
+        weights.append(total)
+    return weights
+
+
+@contextmanager
+def explicit_dates():
+    """Отключает auto_now у дат постов и комментариев, чтобы
+    bulk_create сохранил заданные даты."""
+    fields = [
+        (Post._meta.get_field('pub_date'), 'auto_now_add'),
+        (Post._meta.get_field('updated'), 'auto_now'),
+        (Comment._meta.get_field('created'), 'auto_now_add'),
+    ]
+    saved = [getattr(field, flag) for field, flag in fields]
+    for field, flag in fields:
+        setattr(field, flag, False)
+    try:
+        yield
+    finally:
+        for (field, flag), value in zip(fields, saved):
+            setattr(field, flag, value)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, постами, '
+        'комментариями, подписками и картинками для нагрузочных замеров.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument(
+            '--images', type=float, default=0.1,
+            help='Доля постов с картинкой.'
+        )
+        parser.add_argument(
+            '--skew', type=float, default=1.0,
+            help='Показатель степенного закона для авторов и подписок.'
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.start = self.now - timedelta(days=options['days'])
+        started = time.perf_counter()
+        with transaction.atomic():
+            users = self.create_users(options['users'])
+            groups = self.create_groups(options['groups'])
+            # Авторы и популярность идут в случайном порядке, а не по
+            # номерам пользователей.
+            authors = self.random.sample(users, len(users))
+            weights = power_law(len(authors), options['skew'])
+            posts = self.create_posts(
+                options['posts'], authors, weights, groups,
+                self.create_images(options['images'])
+            )
+            self.create_comments(options['comments'], posts, users)
+            self.create_follows(options['follows'], users, authors, weights)
+            self.stdout.write('Пересчёт счётчиков, лент и индекса поиска…')
+            reconcile(batch_size=self.batch_size)
+            timeline.rebuild()
+            search.rebuild(batch_size=self.batch_size)
+            # Ленты пересобраны целиком; сессии в кэше остаются.
+            cache.reset_pages()
+        self.stdout.write(
+            f'Готово за {time.perf_counter() - started:.1f} с. '
+            f'Пароль пользователей: {SEED_PASSWORD}'
+        )
+
+    def create_users(self, count):
+        first = (User.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0) + 1
+        password = make_password(SEED_PASSWORD)
+        with mixer.ctx(commit=False):
+            users = mixer.cycle(count).blend(
+                User,
+                username=mixer.sequence(lambda n: f'seed{first + n}'),
+                password=password,
+                first_name=self.fake.first_name,
+                last_name=self.fake.last_name,
+                email=self.fake.email,
+                is_staff=False,
+                is_superuser=False,
+                is_active=True,
+            )
+        User.objects.bulk_create(users)
+        self.stdout.write(f'Пользователей: {count}')
+        return list(User.objects.filter(
+            username__in=[user.username for user in users]
+        ).values_list('pk', flat=True))
+
+    def create_groups(self, count):
+        first = Group.objects.count()
+        with mixer.ctx(commit=False):
+            groups = mixer.cycle(count).blend(
+                Group,
+                title=lambda: self.fake.sentence(nb_words=3)[:-1],
+                slug=mixer.sequence(lambda n: f'seed-{first + n}'),
+                description=self.fake.paragraph,
+            )
+        Group.objects.bulk_create(groups)
+        self.stdout.write(f'Групп: {count}')
+        return list(Group.objects.filter(
+            slug__in=[group.slug for group in groups]
+        ).values_list('pk', flat=True))
+
+    def create_images(self, share):
+        """Несколько маленьких картинок, общих для постов с картинкой."""
+        if not share:
+            return share, []
+        names = []
+        for number in range(IMAGE_VARIANTS):
+            name = f'posts/seed-{number}.png'
+            if not default_storage.exists(name):
+                color = tuple(self.random.randrange(256) for _ in range(3))
+                buffer = io.BytesIO()
+                Image.new('RGB', IMAGE_SIZE, color).save(buffer, 'PNG')
+                name = default_storage.save(
+                    name, ContentFile(buffer.getvalue())
+                )
+            thumbnails.generate(name)
+            names.append(name)
+        return share, names
+
+    def create_posts(self, count, authors, weights, groups, images):
+        """Посты идут по времени с равным шагом, авторы — по степенному
+        закону. Возвращает номера созданных постов по порядку."""
+        share, names = images
+        last = Post.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        step = (self.now - self.start) / max(count, 1)
+        with explicit_dates():
+            for start in range(0, count, self.batch_size):
+                size = min(self.batch_size, count - start)
+                chosen = self.random.choices(
+                    authors, cum_weights=weights, k=size
+                )
+                posts = []
+                for offset, author_id in enumerate(chosen):
+                    date = self.start + step * (start + offset)
+                    posts.append(Post(
+                        author_id=author_id,
+                        group_id=(
+                            self.random.choice(groups)
+                            if groups and self.random.random() < 0.5
+                            else None
+                        ),
+                        text=self.fake.text(max_nb_chars=300),
+                        image=(
+                            self.random.choice(names)
+                            if names and self.random.random() < share
+                            else ''
+                        ),
+                        pub_date=date,
+                        updated=date,
+                    ))
+                Post.objects.bulk_create(posts)
+        self.stdout.write(f'Постов: {count}')
+        return list(Post.objects.filter(pk__gt=last).order_by(
+            'pk'
+        ).values_list('pk', flat=True))
+
+    def create_comments(self, count, posts, users):
+        if not posts or not users:
+            return
+        step = (self.now - self.start) / len(posts)
+        with explicit_dates():
+            for start in range(0, count, self.batch_size):
+                comments = []
+                for _ in range(min(self.batch_size, count - start)):
+                    index = self.random.randrange(len(posts))
+                    # Комментарий появляется после поста, но не в будущем.
+                    created = min(
+                        self.start + step * (index + self.random.random()),
+                        self.now
+                    )
+                    comments.append(Comment(
+                        post_id=posts[index],
+                        author_id=self.random.choice(users),
+                        text=self.fake.sentence(),
+                        created=created,
+                    ))
+                Comment.objects.bulk_create(comments)
+        self.stdout.write(f'Комментариев: {count}')
+
+    def create_follows(self, count, users, authors, weights):
+        """Подписчики выбираются равномерно, авторы — по тому же закону,
+        что и число постов: у популярных авторов больше подписчиков."""
+        follows = set()
+        attempts = 0
+        while len(follows) < count and attempts < count * 10:
+            attempts += 1
+            user_id = self.random.choice(users)
+            author_id = self.random.choices(authors, cum_weights=weights)[0]
+            if user_id != author_id:
+                follows.add((user_id, author_id))
+        Follow.objects.bulk_create(
+            (
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id, author_id in follows
+            ),
+            ignore_conflicts=True,
+        )
+        self.stdout.write(f'Подписок: {len(follows)}')
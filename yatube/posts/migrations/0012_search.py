@@ -0,0 +1,58 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from posts.stemmer import terms
+
+
+def build_index(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    SearchTerm = apps.get_model('posts', 'SearchTerm')
+    posts = Post.objects.select_related('group')
+    for post in posts.iterator():
+        title = post.group.title if post.group_id else ''
+        SearchTerm.objects.bulk_create(
+            [
+                SearchTerm(term=term, post_id=post.pk, pub_date=post.pub_date)
+                for term in terms(post.text, title)
+            ],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_post_updated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(
+                    auto_created=True,
+                    primary_key=True,
+                    serialize=False,
+                    verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('pub_date', models.DateTimeField()),
+                ('post', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    related_name='search_terms',
+                    to='posts.Post')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(
+                fields=['term', 'pub_date', 'post'],
+                name='posts_searc_term_09c47d_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='searchterm',
+            unique_together={('term', 'post')},
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
@@ -8,11 +8,30 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self) -> str:
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    FEED_FIELDS = (
+        'text', 'pub_date', 'updated', 'image',
+        'author', 'author__username',
+        'author__first_name', 'author__last_name',
+        'group', 'group__slug', 'group__title',
+    )
+
+    def for_feed(self):
+        """Только то, что выводит карточка поста, автор и группа — JOIN."""
+        return self.select_related('author', 'group').only(*self.FEED_FIELDS)
+
+    def for_detail(self):
+        """Пост с автором, его счётчиками и группой; комментарии
+        выводятся постранично отдельно."""
+        return self.select_related('author__profile', 'group')
+
+
 class Post(models.Model):
     text = models.TextField(
         'Текст поста',
@@ -23,6 +42,7 @@ class Post(models.Model):
         auto_now_add=True,
         db_index=True
     )
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -45,6 +65,9 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.text[:15]
@@ -53,6 +76,11 @@ class Post(models.Model):
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Страницы группы и профиля читаются по индексу в порядке ленты.
+        indexes = [
+            models.Index(fields=['group', '-pub_date', '-id']),
+            models.Index(fields=['author', '-pub_date', '-id']),
+        ]
 
 
 class Comment(models.Model):
@@ -79,6 +107,9 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ["-created"]
+        indexes = [
+            models.Index(fields=["post", "created"]),
+        ]
 
     def __str__(self):
         return self.text
@@ -95,3 +126,69 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name="following"
     )
+
+
+class Profile(models.Model):
+    """Счётчики автора, поддерживаемые сигналами."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name="profile"
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    # Посты автора не раскладываются по лентам, а читаются при показе
+    # ленты, см. posts.timeline.update_celebrity.
+    celebrity = models.BooleanField(default=False)
+
+    def __str__(self):
+        return str(self.user)
+
+
+class Timeline(models.Model):
+    """Материализованная лента подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="timeline"
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="timeline_entries"
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+"
+    )
+    # Копия даты поста: страница ленты читается по индексу в её порядке.
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("user", "post")
+        indexes = [
+            models.Index(fields=["user", "author"]),
+            models.Index(fields=["user", "-pub_date", "-post"]),
+        ]
+
+
+class SearchTerm(models.Model):
+    """Обратный индекс поиска: основа слова из текста поста или
+    названия его группы."""
+    term = models.CharField(max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="search_terms"
+    )
+    # Копия даты поста: выдача читается по индексу в порядке ленты.
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("term", "post")
+        indexes = [
+            models.Index(fields=["term", "pub_date", "post"]),
+        ]
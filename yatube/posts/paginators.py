@@ -0,0 +1,129 @@
+import base64
+import binascii
+import json
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import SimpleLazyObject, cached_property
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу (key, tiebreak) без OFFSET и COUNT(*).
+
+    tiebreak — поле, равное id строки; выборка через связанную таблицу
+    может передать её столбец, чтобы порядок целиком шёл по её индексу.
+
+    Соседние страницы адресуются непрозрачными курсорами, старые ссылки
+    вида ?page=N по-прежнему обслуживаются смещением. Если известен
+    поддерживаемый счётчик строк, он передаётся в count вместо COUNT(*).
+
+    Экземпляр описывает одну запрошенную страницу: строки выбираются
+    лениво, поэтому закэшированный фрагмент шаблона не обращается к базе.
+    """
+
+    def __init__(self, object_list, per_page, key='pub_date', count=None,
+                 tiebreak='id'):
+        self.key = key
+        self.tiebreak = tiebreak
+        self.position = None
+        self.number = 1
+        super().__init__(
+            object_list.order_by(f'-{key}', f'-{tiebreak}'), per_page
+        )
+        if count is not None:
+            self.count = count
+
+    def encode_cursor(self, obj, backwards=False):
+        value = getattr(obj, self.key).isoformat()
+        raw = json.dumps([value, obj.pk, int(backwards)])
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            value, pk, backwards = json.loads(
+                base64.urlsafe_b64decode(padded.encode())
+            )
+            value = parse_datetime(value)
+            pk = int(pk)
+        except (binascii.Error, TypeError, ValueError):
+            return None
+        if value is None:
+            return None
+        return value, pk, bool(backwards)
+
+    def get_page(self, number=None, cursor=None):
+        self.position = self.decode_cursor(cursor) if cursor else None
+        if self.position is not None:
+            self.number = None
+        else:
+            try:
+                self.number = max(int(number), 1)
+            except (TypeError, ValueError):
+                self.number = 1
+            if 'count' in self.__dict__:
+                self.number = min(self.number, max(self.num_pages, 1))
+        return Page(SimpleLazyObject(self._rows), self.number, self)
+
+    @cached_property
+    def _window(self):
+        if self.position is not None:
+            return self._cursor_window(*self.position)
+        offset = (self.number - 1) * self.per_page
+        rows = list(self.object_list[offset:offset + self.per_page + 1])
+        if not rows and self.number > 1:
+            self.number = 1
+            rows = list(self.object_list[:self.per_page + 1])
+        return (
+            rows[:self.per_page], self.number > 1, len(rows) > self.per_page
+        )
+
+    def _cursor_window(self, value, pk, backwards):
+        # Нестрогая граница по ключу отдельным условием: по ней индекс
+        # сразу встаёт на курсор, а не просматривается с начала.
+        key, tiebreak = self.key, self.tiebreak
+        if backwards:
+            queryset = self.object_list.filter(
+                **{f'{key}__gte': value}
+            ).filter(
+                Q(**{f'{key}__gt': value}) | Q(**{f'{tiebreak}__gt': pk})
+            ).order_by(key, tiebreak)
+        else:
+            queryset = self.object_list.filter(
+                **{f'{key}__lte': value}
+            ).filter(
+                Q(**{f'{key}__lt': value}) | Q(**{f'{tiebreak}__lt': pk})
+            )
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        if backwards:
+            return rows[:self.per_page][::-1], has_more, True
+        return rows[:self.per_page], True, has_more
+
+    def _rows(self):
+        return self._window[0]
+
+    @cached_property
+    def previous_cursor(self):
+        rows, has_previous, _ = self._window
+        if rows and has_previous:
+            return self.encode_cursor(rows[0], backwards=True)
+        return None
+
+    @cached_property
+    def next_cursor(self):
+        rows, _, has_next = self._window
+        if rows and has_next:
+            return self.encode_cursor(rows[-1])
+        return None
+
+
+def paginate(request, queryset, per_page, key='pub_date', count=None,
+             tiebreak='id'):
+    paginator = CursorPaginator(
+        queryset, per_page, key=key, count=count, tiebreak=tiebreak
+    )
+    return paginator.get_page(
+        request.GET.get('page'), cursor=request.GET.get('cursor')
+    )
@@ -0,0 +1,138 @@
+from django.conf import settings
+from django.db.models import F
+
+from core import tasks
+from .models import Post, SearchTerm
+from .stemmer import terms
+
+
+def post_terms(post):
+    return terms(post.text, post.group.title if post.group_id else '')
+
+
+def index_post(post):
+    """Приводит термы поста в индексе к его текущему тексту и группе."""
+    wanted = post_terms(post)
+    stored = set(
+        SearchTerm.objects.filter(post=post).values_list('term', flat=True)
+    )
+    stale = stored - wanted
+    if stale:
+        SearchTerm.objects.filter(post=post, term__in=stale).delete()
+    SearchTerm.objects.bulk_create(
+        (
+            SearchTerm(term=term, post=post, pub_date=post.pub_date)
+            for term in wanted - stored
+        ),
+        batch_size=settings.SEARCH_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def enqueue(post):
+    """Ставит переиндексацию поста задачей core.tasks."""
+    tasks.enqueue('posts.search', {'post_id': post.pk})
+
+
+@tasks.task('posts.search', batch_size=100)
+def index_batch(params):
+    """Переиндексирует пачку постов; удалённые до задачи пропускаются."""
+    posts = Post.objects.filter(
+        id__in=[item['post_id'] for item in params]
+    ).select_related('group')
+    for post in posts.iterator():
+        index_post(post)
+
+
+# Сколько id постов хранит одна задача posts.reindex.
+REINDEX_CHUNK = 500
+
+
+def enqueue_group(group):
+    """Ставит переиндексацию постов группы после смены её названия."""
+    tasks.enqueue('posts.reindex', {'group_id': group.pk})
+
+
+def enqueue_posts(post_ids):
+    """Ставит переиндексацию постов по id задачами до REINDEX_CHUNK
+    постов."""
+    for start in range(0, len(post_ids), REINDEX_CHUNK):
+        tasks.enqueue('posts.reindex', {
+            'post_ids': post_ids[start:start + REINDEX_CHUNK]
+        })
+
+
+@tasks.task('posts.reindex')
+def reindex_task(group_id=None, post_ids=None):
+    if group_id is not None:
+        reindex(Post.objects.filter(group_id=group_id))
+    else:
+        reindex(Post.objects.filter(id__in=post_ids))
+
+
+def reindex(posts, batch_size=1000):
+    """Строит индекс постов posts заново: старые термы удаляются одним
+    запросом, новые пишутся пачками index_posts."""
+    SearchTerm.objects.filter(post__in=posts).delete()
+    return index_posts(posts, batch_size)
+
+
+def index_posts(posts, batch_size=1000):
+    """Добавляет в индекс термы постов, которых в нём ещё нет, например
+    после bulk_create; возвращает число термов."""
+    posts = posts.select_related('group').only(
+        'text', 'pub_date', 'group__title'
+    )
+    created = 0
+    entries = []
+    for post in posts.iterator(chunk_size=batch_size):
+        entries.extend(
+            SearchTerm(term=term, post_id=post.pk, pub_date=post.pub_date)
+            for term in post_terms(post)
+        )
+        if len(entries) >= batch_size:
+            SearchTerm.objects.bulk_create(entries, ignore_conflicts=True)
+            created += len(entries)
+            entries = []
+    SearchTerm.objects.bulk_create(entries, ignore_conflicts=True)
+    return created + len(entries)
+
+
+def rebuild(batch_size=1000):
+    """Строит индекс заново для всех постов, возвращает число термов."""
+    SearchTerm.objects.all().delete()
+    return index_posts(Post.objects.all(), batch_size)
+
+
+def find_posts(query):
+    """Посты, в тексте или группе которых есть все слова запроса.
+
+    Выдачу ведёт самый редкий терм: его записи читаются по индексу
+    (term, pub_date) уже в порядке ленты, остальные термы проверяются
+    по (term, post). Частые термы считаются только до
+    SEARCH_COUNT_LIMIT: при таком числе записей любой из них быстро
+    набирает страницу. Дата ведущего терма доступна как found_date —
+    по ней выдача разбивается на страницы.
+    """
+    # Пустая выдача тоже должна знать found_date для постраничного вывода.
+    nothing = Post.objects.none().annotate(found_date=F('pub_date'))
+    wanted = sorted(terms(query))
+    if not wanted:
+        return nothing
+    if len(wanted) > 1:
+        frequency = {
+            term: SearchTerm.objects.filter(
+                term=term
+            )[:settings.SEARCH_COUNT_LIMIT].count()
+            for term in wanted
+        }
+        if not all(frequency.values()):
+            return nothing
+        wanted.sort(key=frequency.get)
+    leading, *rest = wanted
+    posts = Post.objects.filter(search_terms__term=leading).annotate(
+        found_date=F('search_terms__pub_date')
+    )
+    for term in rest:
+        posts = posts.filter(search_terms__term=term)
+    return posts
@@ -0,0 +1,199 @@
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from core import page_cache
+from . import cache, counters, search, thumbnails, timeline
+from .models import Comment, Follow, Group, Post, Profile, User
+
+
+def purge_post(post, *group_ids):
+    """Сбрасывает страницы, на которых виден пост."""
+    group_ids = {post.group_id, *group_ids} - {None}
+    page_cache.purge(
+        'feed',
+        f'post-{post.pk}',
+        f'author-{post.author_id}',
+        *(f'group-{group_id}' for group_id in group_ids)
+    )
+
+
+def purge_group(group, author_ids):
+    page_cache.purge(
+        'feed',
+        f'group-{group.pk}',
+        *(f'author-{author_id}' for author_id in author_ids)
+    )
+
+
+# Поля пользователя, которые видны на страницах с его постами.
+USER_SHOWN_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=User)
+def user_changing(sender, instance, raw=False, update_fields=None,
+                  **kwargs):
+    if raw or instance._state.adding:
+        return
+    # Вход сохраняет только last_login — лишний запрос не нужен.
+    if update_fields is not None and not set(update_fields) & set(
+        USER_SHOWN_FIELDS
+    ):
+        return
+    instance._saved_names = User.objects.filter(
+        pk=instance.pk
+    ).values_list(*USER_SHOWN_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        # Номер пользователя мог достаться от удалённого.
+        page_cache.purge(f'author-{instance.pk}')
+        Profile.objects.get_or_create(user=instance)
+        return
+    saved = instance.__dict__.pop('_saved_names', None)
+    if saved is None or saved == tuple(
+        getattr(instance, field) for field in USER_SHOWN_FIELDS
+    ):
+        return
+    cache.bump('posts')
+    # Имя видно и в комментариях к чужим постам.
+    cache.bump('names')
+    page_cache.purge(
+        'feed',
+        f'author-{instance.pk}',
+        *(f'group-{group_id}' for group_id in instance.posts.exclude(
+            group=None
+        ).values_list('group_id', flat=True).distinct()),
+        *(f'post-{post_id}' for post_id in Comment.objects.filter(
+            author=instance
+        ).values_list('post_id', flat=True).distinct())
+    )
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        return
+    saved = Post.objects.filter(
+        pk=instance.pk
+    ).values_list('group_id', 'image', 'text').first()
+    if saved is not None:
+        (instance._saved_group_id, instance._saved_image,
+         instance._saved_text) = saved
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    cache.bump('posts')
+    saved_group_id = getattr(instance, '_saved_group_id', instance.group_id)
+    purge_post(instance, saved_group_id)
+    image = instance.image.name
+    if image and image != getattr(instance, '_saved_image', None):
+        thumbnails.enqueue(image)
+    if created:
+        counters.change_profile(instance.author_id, 'posts_count', 1)
+        counters.change_group(instance.group_id, 1)
+        timeline.fan_out(instance)
+        search.enqueue(instance)
+        return
+    if saved_group_id != instance.group_id:
+        counters.change_group(saved_group_id, -1)
+        counters.change_group(instance.group_id, 1)
+    if (saved_group_id != instance.group_id
+            or getattr(instance, '_saved_text', None) != instance.text):
+        search.enqueue(instance)
+
+
+@receiver(pre_save, sender=Group)
+def group_changing(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        return
+    instance._saved_title = Group.objects.filter(
+        pk=instance.pk
+    ).values_list('title', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        page_cache.purge(f'group-{instance.pk}')
+        return
+    cache.bump('posts')
+    cache.bump('names')
+    purge_group(
+        instance,
+        instance.posts.values_list('author_id', flat=True).distinct()
+    )
+    # Название группы входит в индекс её постов, описание — нет.
+    if instance.__dict__.pop('_saved_title', None) != instance.title:
+        search.enqueue_group(instance)
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    posts = list(instance.posts.values_list('id', 'author_id'))
+    instance._post_ids = [post_id for post_id, _ in posts]
+    instance._author_ids = {author_id for _, author_id in posts}
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    cache.bump('posts')
+    purge_group(instance, instance._author_ids)
+    search.enqueue_posts(instance._post_ids)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    cache.bump('posts')
+    purge_post(instance)
+    counters.change_profile(instance.author_id, 'posts_count', -1)
+    counters.change_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        page_cache.purge(f'post-{instance.post_id}')
+        counters.change_profile(instance.author_id, 'comments_count', 1)
+        counters.change_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    page_cache.purge(f'post-{instance.post_id}')
+    counters.change_profile(instance.author_id, 'comments_count', -1)
+    counters.change_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        cache.bump(f'follow:{instance.user_id}')
+        page_cache.purge(
+            f'author-{instance.author_id}', f'author-{instance.user_id}'
+        )
+        counters.change_profile(instance.author_id, 'followers_count', 1)
+        counters.change_profile(instance.user_id, 'following_count', 1)
+        if not timeline.update_celebrity(instance.author_id):
+            timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    cache.bump(f'follow:{instance.user_id}')
+    page_cache.purge(
+        f'author-{instance.author_id}', f'author-{instance.user_id}'
+    )
+    counters.change_profile(instance.author_id, 'followers_count', -1)
+    counters.change_profile(instance.user_id, 'following_count', -1)
+    timeline.trim(instance.user_id, instance.author_id)
+    timeline.update_celebrity(instance.author_id)
@@ -0,0 +1,107 @@
+"""Разбиение текста на термы для поиска: слова приводятся к основе
+русским стеммером Snowball (Портера), частые служебные слова
+отбрасываются."""
+import re
+from functools import lru_cache
+
+VOWELS = 'аеиоуыэюя'
+MAX_TERM_LENGTH = 64
+
+WORD = re.compile(r'\w+')
+CYRILLIC = re.compile(r'^[а-я]+$')
+RV = re.compile(f'^(.*?[{VOWELS}])(.*)$')
+R1 = re.compile(f'[{VOWELS}][^{VOWELS}]')
+
+PERFECTIVE_GERUND = re.compile(
+    r'(ив|ивши|ившись|ыв|ывши|ывшись|(?<=[ая])(в|вши|вшись))$'
+)
+REFLEXIVE = re.compile(r'(ся|сь)$')
+ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|'
+    r'их|ых|ую|юю|ая|яя|ою|ею)$'
+)
+PARTICIPLE = re.compile(r'(ивш|ывш|ующ|(?<=[ая])(ем|нн|вш|ющ|щ))$')
+VERB = re.compile(
+    r'(ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|'
+    r'ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю|'
+    r'(?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно))$'
+)
+NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|'
+    r'ем|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+I_ENDING = re.compile(r'и$')
+DERIVATIONAL = re.compile(r'ость?$')
+SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+
+STOP_WORDS = frozenset((
+    'а', 'без', 'бы', 'в', 'во', 'вот', 'все', 'да', 'для', 'до', 'же',
+    'за', 'и', 'из', 'или', 'к', 'как', 'ко', 'ли', 'на', 'над', 'не',
+    'ни', 'но', 'о', 'об', 'от', 'по', 'под', 'при', 'про', 'с', 'со',
+    'так', 'то', 'у', 'что', 'это',
+))
+
+
+def _cut(pattern, word):
+    cut = pattern.sub('', word, 1)
+    return cut, cut != word
+
+
+def _r2_start(word):
+    """Начало области R2 — после второго сочетания «гласная, согласная»."""
+    start = 0
+    for _ in range(2):
+        match = R1.search(word, start)
+        if match is None:
+            return len(word)
+        start = match.end()
+    return start
+
+
+@lru_cache(maxsize=65536)
+def stem(word):
+    """Основа слова по алгоритму Snowball для русского языка."""
+    word = word.lower().replace('ё', 'е')
+    match = RV.match(word)
+    if not CYRILLIC.match(word) or match is None:
+        return word
+    head, rv = match.groups()
+
+    rv, found = _cut(PERFECTIVE_GERUND, rv)
+    if not found:
+        rv, _ = _cut(REFLEXIVE, rv)
+        rv, found = _cut(ADJECTIVE, rv)
+        if found:
+            rv, _ = _cut(PARTICIPLE, rv)
+        else:
+            rv, found = _cut(VERB, rv)
+            if not found:
+                rv, _ = _cut(NOUN, rv)
+
+    rv, _ = _cut(I_ENDING, rv)
+
+    derivational = DERIVATIONAL.search(rv)
+    if derivational and len(head) + derivational.start() >= _r2_start(
+        head + rv
+    ):
+        rv = rv[:derivational.start()]
+
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    else:
+        rv, found = _cut(SUPERLATIVE, rv)
+        if found and rv.endswith('нн'):
+            rv = rv[:-1]
+        elif not found and rv.endswith('ь'):
+            rv = rv[:-1]
+    return head + rv
+
+
+def terms(*texts):
+    """Множество термов для всех переданных текстов."""
+    return {
+        stem(word)[:MAX_TERM_LENGTH]
+        for text in texts if text
+        for word in WORD.findall(text.lower())
+        if word not in STOP_WORDS
+    }
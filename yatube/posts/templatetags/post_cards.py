@@ -0,0 +1,48 @@
+import hashlib
+
+from django import template
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+from ..thumbnail_store import preloaded
+
+register = template.Library()
+
+CARD_KEY = 'posts:card:{}:{}:{}:{}'
+CARD_TIMEOUT = 60 * 60 * 24
+
+
+def card_key(post):
+    # Карточка показывает имя автора и адрес группы: их переименование
+    # не меняет post.updated, поэтому они тоже входят в ключ.
+    author = post.author
+    shown = '\n'.join((
+        author.username, author.first_name, author.last_name,
+        post.group.slug if post.group_id else '',
+    ))
+    return CARD_KEY.format(
+        post.pk, post.updated.timestamp(), get_language(),
+        hashlib.md5(shown.encode()).hexdigest()[:12]
+    )
+
+
+@register.simple_tag
+def post_cards(posts):
+    """Карточки постов страницы: готовые берутся из кэша одним get_many,
+    отрисовываются только отсутствующие, эскизы для них читаются
+    одним запросом."""
+    keys = [(card_key(post), post) for post in posts]
+    cards = cache.get_many([key for key, _ in keys])
+    stale = [(key, post) for key, post in keys if key not in cards]
+    with preloaded(post.image for _, post in stale):
+        missing = {
+            key: render_to_string(
+                'posts/includes/post_card.html', {'post': post}
+            )
+            for key, post in stale
+        }
+    cache.set_many(missing, CARD_TIMEOUT)
+    cards.update(missing)
+    return [mark_safe(cards[key]) for key, _ in keys]
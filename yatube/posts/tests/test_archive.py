@@ -0,0 +1,100 @@
+import io
+import json
+import shutil
+import tempfile
+import zipfile
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ArchiveTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.other = User.objects.create_user(username='other')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Пост с картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif')
+        )
+        Post.objects.create(author=cls.other, text='Чужой пост')
+        Comment.objects.create(
+            post=cls.post, author=cls.user, text='Мой комментарий'
+        )
+        Follow.objects.create(user=cls.user, author=cls.other)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.url = reverse('posts:profile_export', args=('auth',))
+
+    def test_export_streams_user_data(self):
+        """Архив отдаётся потоком и содержит только данные владельца."""
+        response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        archive = zipfile.ZipFile(
+            io.BytesIO(b''.join(response.streaming_content))
+        )
+
+        def rows(name):
+            return [
+                json.loads(line)
+                for line in archive.read(name).decode().splitlines()
+            ]
+
+        self.assertEqual(
+            [row['text'] for row in rows('posts.ndjson')],
+            ['Пост с картинкой']
+        )
+        self.assertEqual(
+            rows('comments.ndjson')[0]['post_id'], self.post.pk
+        )
+        self.assertEqual(
+            rows('follows.ndjson'), [{'author__username': 'other'}]
+        )
+        self.assertEqual(
+            archive.read(f'images/{self.post.image.name}'), SMALL_GIF
+        )
+
+    def test_export_is_private(self):
+        """Чужой архив недоступен, гостя отправляют на вход."""
+        response = self.client.get(
+            reverse('posts:profile_export', args=('other',))
+        )
+        self.assertEqual(response.status_code, 403)
+        response = Client().get(self.url)
+        self.assertRedirects(
+            response, f'{reverse("users:login")}?next={self.url}'
+        )
+
+    def test_profile_links_own_export(self):
+        """Ссылка на архив видна только на своей странице."""
+        response = self.client.get(reverse('posts:profile', args=('auth',)))
+        self.assertContains(response, self.url)
+        response = self.client.get(
+            reverse('posts:profile', args=('other',))
+        )
+        self.assertNotContains(response, 'export/')
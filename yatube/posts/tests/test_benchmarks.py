@@ -0,0 +1,95 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from .. import urls
+from ..models import Comment, Follow, Group, Post, Profile, Timeline, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class BenchmarkCommandsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'seed_data', users=20, groups=3, posts=200, comments=100,
+            follows=40, images=0.2, stdout=StringIO()
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.output = os.path.join(TEMP_MEDIA_ROOT, 'benchmark.json')
+        self.baseline = os.path.join(TEMP_MEDIA_ROOT, 'baseline.json')
+
+    def test_seed_data_creates_consistent_dataset(self):
+        """Данные созданы, счётчики и ленты сходятся, авторы неравны."""
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertEqual(Follow.objects.count(), 40)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assertTrue(Timeline.objects.exists())
+        counts = sorted(
+            Profile.objects.values_list('posts_count', flat=True),
+            reverse=True
+        )
+        self.assertEqual(sum(counts), 200)
+        self.assertGreater(counts[0], 3 * counts[len(counts) // 2])
+
+    def benchmark(self, **options):
+        call_command(
+            'benchmark_views', requests=2, warmup=0, output=self.output,
+            baseline=self.baseline, stdout=StringIO(), **options
+        )
+        with open(self.output, encoding='utf-8') as file:
+            return json.load(file)['routes']
+
+    def test_benchmark_covers_every_route(self):
+        """Замеры есть для каждого адреса posts/urls.py."""
+        routes = self.benchmark()
+        self.assertEqual(
+            set(routes),
+            {f'{urls.app_name}:{url.name}' for url in urls.urlpatterns}
+        )
+        for result in routes.values():
+            self.assertEqual(result['requests'], 2)
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+
+    def test_benchmark_flags_regressions(self):
+        """Рост задержки или числа запросов против базы — ошибка."""
+        routes = self.benchmark(update_baseline=True)
+        with open(self.baseline, 'w', encoding='utf-8') as file:
+            json.dump({
+                name: dict(result, p95_ms=0, queries=0)
+                for name, result in routes.items()
+            }, file)
+        with self.assertRaisesMessage(CommandError, 'Регрессии'):
+            self.benchmark()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedDataDefaultsTests(TestCase):
+    def test_seed_data_with_default_batch_size(self):
+        """С размером пачки по умолчанию создаются сотни пользователей:
+        SQLite принимает не больше 500 строк в одном INSERT."""
+        call_command(
+            'seed_data', users=600, groups=1, posts=600, comments=0,
+            follows=600, images=0, stdout=StringIO()
+        )
+        self.assertEqual(Profile.objects.count(), 600)
+        self.assertEqual(
+            sum(Profile.objects.values_list('posts_count', flat=True)), 600
+        )
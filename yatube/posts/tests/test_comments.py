@@ -0,0 +1,66 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Post, User
+from ..views import MAX_COMMENTS
+
+EXTRA_COMMENTS = 5
+
+
+class CommentPagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(MAX_COMMENTS + EXTRA_COMMENTS)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_post_detail_shows_first_comments_page(self):
+        """Страница поста выводит одну страницу комментариев и ссылку
+        на следующую."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.id,))
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), MAX_COMMENTS)
+        self.assertContains(
+            response,
+            reverse('posts:post_comments', args=(self.post.id,))
+            + f'?cursor={comments.paginator.next_cursor}'
+        )
+
+    def test_fragment_loads_next_comments(self):
+        """Фрагмент по курсору отдаёт оставшиеся комментарии."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.id,))
+        )
+        shown = {comment.id for comment in response.context['comments']}
+        response = self.client.get(
+            reverse('posts:post_comments', args=(self.post.id,)),
+            {'cursor': response.context['comments'].paginator.next_cursor}
+        )
+        self.assertTemplateUsed(response, 'includes/comment_list.html')
+        more = {comment.id for comment in response.context['comments']}
+        self.assertEqual(len(more), EXTRA_COMMENTS)
+        self.assertFalse(shown & more)
+        self.assertNotContains(response, 'data-comments-more')
+
+    def test_fragment_of_missing_post_is_not_found(self):
+        """Фрагмент комментариев несуществующего поста отдаёт 404."""
+        response = self.client.get(
+            reverse('posts:post_comments', args=(self.post.id + 1000,))
+        )
+        self.assertEqual(response.status_code, 404)
+        post = Post.objects.create(author=self.user, text='Без комментариев')
+        response = self.client.get(
+            reverse('posts:post_comments', args=(post.id,))
+        )
+        self.assertEqual(response.status_code, 200)
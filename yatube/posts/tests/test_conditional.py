@@ -0,0 +1,158 @@
+import time
+from unittest import mock
+
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def rename_group(self):
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+
+    def revalidate(self, client, url, response):
+        return client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_pages_answer_304(self):
+        """Неизменившиеся ленты и страница поста отвечают 304 по ETag."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.user.username,)),
+            reverse('posts:post_detail', args=(self.post.id,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    self.revalidate(self.client, url, response).status_code,
+                    304
+                )
+
+    def test_feed_validator_skips_posts(self):
+        """Проверка ленты не обращается к базе."""
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.revalidate(self.client, url, response)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 0)
+
+    def test_changes_invalidate_validators(self):
+        """Новый пост, комментарий, подписка и правка группы меняют ETag."""
+        cases = (
+            (reverse('posts:index'), lambda: Post.objects.create(
+                author=self.user, text='Новый пост'
+            )),
+            (
+                reverse('posts:post_detail', args=(self.post.id,)),
+                lambda: Comment.objects.create(
+                    post=self.post, author=self.reader, text='Комментарий'
+                )
+            ),
+            (reverse('posts:follow_index'), lambda: Follow.objects.create(
+                user=self.reader, author=self.user
+            )),
+            (
+                reverse('posts:group_posts', args=(self.group.slug,)),
+                self.rename_group
+            ),
+        )
+        for url, change in cases:
+            with self.subTest(url=url):
+                response = self.reader_client.get(url)
+                change()
+                self.assertEqual(
+                    self.revalidate(
+                        self.reader_client, url, response
+                    ).status_code,
+                    200
+                )
+
+    def test_renames_invalidate_post_validators(self):
+        """Переименование автора, комментатора и адреса группы меняет
+        ETag и Last-Modified страницы поста."""
+        url = reverse('posts:post_detail', args=(self.post.id,))
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+
+        def rename_author():
+            self.user.first_name = 'Новое имя'
+            self.user.save()
+
+        def rename_commenter():
+            self.reader.username = 'renamed'
+            self.reader.save()
+
+        def move_group():
+            group = Group.objects.get(pk=self.group.pk)
+            group.slug = 'new-slug'
+            group.save()
+
+        changes = (rename_author, rename_commenter, move_group)
+        for step, change in enumerate(changes, 1):
+            with self.subTest(change=change.__name__):
+                response = self.client.get(url)
+                # Last-Modified точен до секунды: правка идёт «позже».
+                later = time.time() + 10 * step
+                with mock.patch('posts.cache.time.time', return_value=later):
+                    change()
+                fresh = self.revalidate(self.client, url, response)
+                self.assertEqual(fresh.status_code, 200)
+                self.assertNotEqual(fresh['ETag'], response['ETag'])
+                self.assertEqual(
+                    self.client.get(
+                        url,
+                        HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                    ).status_code,
+                    200
+                )
+
+    def test_validator_depends_on_user(self):
+        """ETag у гостя и у пользователя разный."""
+        url = reverse('posts:index')
+        guest = self.client.get(url)
+        self.assertNotEqual(guest['ETag'], self.reader_client.get(url)['ETag'])
+        self.assertEqual(
+            self.revalidate(self.reader_client, url, guest).status_code, 200
+        )
+
+    def test_if_modified_since_for_guests(self):
+        """Гость получает Last-Modified и 304 по If-Modified-Since."""
+        url = reverse('posts:post_detail', args=(self.post.id,))
+        response = self.client.get(url)
+        self.assertEqual(
+            self.client.get(
+                url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+            ).status_code,
+            304
+        )
+        self.assertFalse(self.reader_client.get(url).has_header(
+            'Last-Modified'
+        ))
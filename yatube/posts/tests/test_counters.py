@@ -0,0 +1,117 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, Profile, User
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание'
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def counter(self, obj, field):
+        obj.refresh_from_db()
+        return getattr(obj, field)
+
+    def test_post_counters(self):
+        """Создание, перенос и удаление поста меняют счётчики."""
+        post = Post.objects.create(
+            author=self.user, text='Тестовый пост', group=self.group
+        )
+        self.assertEqual(self.counter(self.user.profile, 'posts_count'), 1)
+        self.assertEqual(self.counter(self.group, 'posts_count'), 1)
+        post.group = self.other_group
+        post.save()
+        self.assertEqual(self.counter(self.group, 'posts_count'), 0)
+        self.assertEqual(self.counter(self.other_group, 'posts_count'), 1)
+        post.delete()
+        self.assertEqual(self.counter(self.user.profile, 'posts_count'), 0)
+        self.assertEqual(self.counter(self.other_group, 'posts_count'), 0)
+
+    def test_comment_counters(self):
+        """Комментарий увеличивает счётчики поста и автора."""
+        post = Post.objects.create(author=self.user, text='Тестовый пост')
+        self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.id}),
+            data={'text': 'Комментарий'}
+        )
+        self.assertEqual(self.counter(post, 'comments_count'), 1)
+        self.assertEqual(
+            self.counter(self.reader.profile, 'comments_count'), 1
+        )
+
+    def test_follow_counters(self):
+        """Подписка и отписка меняют счётчики обоих пользователей."""
+        url = reverse('posts:profile_follow', args=(self.user.username,))
+        self.client.get(url)
+        self.assertEqual(self.counter(self.user.profile, 'followers_count'), 1)
+        self.assertEqual(
+            self.counter(self.reader.profile, 'following_count'), 1
+        )
+        self.client.get(
+            reverse('posts:profile_unfollow', args=(self.user.username,))
+        )
+        self.assertEqual(self.counter(self.user.profile, 'followers_count'), 0)
+
+    def test_reconcile_counters_repairs_drift(self):
+        """Команда reconcile_counters исправляет расхождения."""
+        post = Post.objects.create(author=self.user, text='Тестовый пост')
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        Follow.objects.create(user=self.reader, author=self.user)
+        Profile.objects.update(
+            posts_count=7, comments_count=7,
+            followers_count=7, following_count=7
+        )
+        Post.objects.update(comments_count=0)
+        self.reader.profile.delete()
+        call_command('reconcile_counters', stdout=StringIO())
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual(profile.posts_count, 1)
+        self.assertEqual(profile.followers_count, 1)
+        self.assertEqual(profile.comments_count, 0)
+        reader = Profile.objects.get(user=self.reader)
+        self.assertEqual(reader.following_count, 1)
+        self.assertEqual(reader.comments_count, 1)
+        self.assertEqual(self.counter(post, 'comments_count'), 1)
+
+    def test_reconcile_creates_many_profiles(self):
+        """Профили создаются и для сотен пользователей без них."""
+        User.objects.bulk_create(
+            User(username=f'bulk{number}') for number in range(600)
+        )
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertFalse(User.objects.filter(profile__isnull=True).exists())
+
+    def test_pages_of_user_without_profile(self):
+        """Страницы пользователя без профиля открываются, профиль
+        создаётся с верными счётчиками."""
+        post = Post.objects.create(author=self.user, text='Тестовый пост')
+        Profile.objects.filter(user=self.user).delete()
+        response = self.client.get(reverse('posts:profile', args=('auth',)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['posts_count'], 1)
+        Profile.objects.filter(user=self.user).delete()
+        response = self.client.get(
+            reverse('posts:post_detail', args=(post.pk,))
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Profile.objects.get(user=self.user).posts_count, 1)
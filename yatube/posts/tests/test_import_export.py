@@ -0,0 +1,155 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import timeline
+from ..models import Follow, Group, Post, SearchTerm, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImportExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Post.objects.create(
+            author=cls.author, group=cls.group, text='Первый пост про котов'
+        )
+        Post.objects.create(author=cls.author, text='Второй пост про собак')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def export(self, name, *args):
+        call_command(
+            'export_posts', self.path(name), *args, stderr=StringIO()
+        )
+
+    def import_(self, name, *args):
+        out = StringIO()
+        call_command('import_posts', self.path(name), *args, stdout=out)
+        return out.getvalue()
+
+    def test_jsonl_round_trip(self):
+        """Выгруженные посты загружаются обратно вместе со счётчиками,
+        лентами подписчиков и индексом поиска."""
+        expected = list(Post.objects.order_by('pk').values_list(
+            'author', 'group', 'text', 'pub_date'
+        ))
+        self.export('posts.jsonl')
+        Post.objects.all().delete()
+        self.import_('posts.jsonl', '--batch-size', '1')
+        self.assertEqual(list(Post.objects.order_by('pk').values_list(
+            'author', 'group', 'text', 'pub_date'
+        )), expected)
+        self.author.profile.refresh_from_db()
+        self.assertEqual(self.author.profile.posts_count, 2)
+        self.assertEqual(timeline.get_feed(self.reader).count(), 2)
+        self.assertTrue(SearchTerm.objects.filter(
+            post__text='Второй пост про собак'
+        ).exists())
+
+    def test_csv_with_images_creates_missing(self):
+        """CSV с архивом картинок создаёт неизвестных авторов и группы."""
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост с картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif')
+        )
+        self.export('posts.csv', '--images', self.path('images.tar'))
+        name = post.image.name
+        Post.objects.all().delete()
+        self.author.delete()
+        self.group.delete()
+        default_storage.delete(name)
+        self.import_(
+            'posts.csv', '--images', self.path('images.tar'),
+            '--create-missing'
+        )
+        self.assertTrue(default_storage.exists(name))
+        imported = Post.objects.get(text='Пост с картинкой')
+        self.assertEqual(imported.author.username, 'writer')
+        self.assertEqual(imported.group.slug, 'group')
+        self.assertEqual(imported.image.name, name)
+        self.assertEqual(imported.author.profile.posts_count, 3)
+
+    def test_unknown_author_is_skipped(self):
+        """Без --create-missing строки неизвестных авторов пропускаются."""
+        self.export('posts.jsonl')
+        Post.objects.all().delete()
+        User.objects.filter(username='writer').update(username='renamed')
+        output = self.import_('posts.jsonl')
+        self.assertFalse(Post.objects.exists())
+        self.assertIn('Готово: 0 постов, пропущено 2', output)
+
+    def test_rerun_skips_imported_posts(self):
+        """Повторная загрузка того же файла не создаёт дублей."""
+        self.export('posts.jsonl')
+        output = self.import_('posts.jsonl')
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertIn('Готово: 0 постов, пропущено 2', output)
+        self.author.profile.refresh_from_db()
+        self.assertEqual(self.author.profile.posts_count, 2)
+
+    def test_interrupted_import_is_finished(self):
+        """Пачки, записанные до ошибки, получают счётчики и ленты."""
+        self.export('posts.jsonl')
+        Post.objects.all().delete()
+        with open(self.path('posts.jsonl'), 'a', encoding='utf-8') as file:
+            file.write('{не json\n')
+        with self.assertRaises(ValueError):
+            self.import_('posts.jsonl', '--batch-size', '1')
+        self.assertEqual(Post.objects.count(), 2)
+        self.author.profile.refresh_from_db()
+        self.assertEqual(self.author.profile.posts_count, 2)
+        self.assertEqual(timeline.get_feed(self.reader).count(), 2)
+
+    def test_import_refreshes_pages_and_keeps_cache(self):
+        """Загрузка сбрасывает страницы автора, но не весь кэш."""
+        self.export('posts.jsonl')
+        with open(self.path('posts.jsonl'), encoding='utf-8') as file:
+            row = json.loads(file.readline())
+        row['text'] = 'Загруженный пост про ежей'
+        with open(self.path('posts.jsonl'), 'a', encoding='utf-8') as file:
+            file.write(json.dumps(row, ensure_ascii=False) + '\n')
+        url = reverse('posts:profile', kwargs={'username': 'writer'})
+        cache.clear()
+        self.client.get(url)
+        cache.set('sessions:unrelated', 'session')
+        self.import_('posts.jsonl')
+        self.assertContains(self.client.get(url), 'Загруженный пост про ежей')
+        self.assertEqual(cache.get('sessions:unrelated'), 'session')
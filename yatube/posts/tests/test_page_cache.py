@@ -0,0 +1,148 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def cached(self, url):
+        """Загружает страницу, пока она не начнёт отдаваться из кэша."""
+        for _ in range(3):
+            response = self.client.get(url)
+            if response.context is None:
+                return response
+        self.fail(f'{url} не попала в кэш')
+
+    def test_guest_pages_are_served_without_queries(self):
+        """Повторный запрос гостя отдаётся из кэша без запросов к базе."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.user.username,)),
+            reverse('posts:post_detail', args=(self.post.id,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.cached(url)
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertEqual(len(queries), 0)
+                self.assertContains(response, 'Тестовый пост')
+
+    def test_changes_purge_affected_pages(self):
+        """Пост, комментарий и подписка сбрасывают свои страницы."""
+        index = reverse('posts:index')
+        detail = reverse('posts:post_detail', args=(self.post.id,))
+        profile = reverse('posts:profile', args=(self.reader.username,))
+        for url in (index, detail, profile):
+            self.cached(url)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Новый комментарий'
+        )
+        self.assertIsNone(self.client.get(index).context)
+        self.assertContains(self.client.get(detail), 'Новый комментарий')
+        Follow.objects.create(user=self.reader, author=self.user)
+        self.assertIsNotNone(self.client.get(profile).context)
+        Post.objects.create(author=self.reader, text='Новый пост')
+        self.assertContains(self.client.get(index), 'Новый пост')
+
+    def test_logged_in_users_bypass_cache(self):
+        """Страница пользователя не берётся из кэша гостей."""
+        url = reverse('posts:index')
+        self.cached(url)
+        self.client.force_login(self.reader)
+        response = self.client.get(url)
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, self.reader.username)
+
+    def test_cached_page_answers_conditional_get(self):
+        """Страница из кэша отвечает 304 на совпавший ETag."""
+        url = reverse('posts:index')
+        response = self.cached(url)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+
+class PageShellTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.author = Client()
+        self.author.force_login(self.user)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def from_shell(self, response):
+        # Из оболочки рисуются только шаблоны дыр, но не base.html.
+        return 'base.html' not in {
+            template.name for template in response.templates
+        }
+
+    def shell(self, url):
+        """Загружает страницу автором, пока её оболочка не попадёт
+        в кэш."""
+        for _ in range(3):
+            if self.from_shell(self.author.get(url)):
+                return
+        self.fail(f'оболочка {url} не попала в кэш')
+
+    def test_holes_are_filled_per_user(self):
+        """Оболочка общая, а личные части рисуются для каждого."""
+        url = reverse('posts:post_detail', args=(self.post.id,))
+        self.shell(url)
+        response = self.reader_client.get(url)
+        self.assertTrue(self.from_shell(response))
+        self.assertContains(response, 'Пользователь: reader')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertNotContains(response, 'редактировать запись')
+        self.assertNotContains(response, '<!--hole')
+        self.assertContains(self.author.get(url), 'редактировать запись')
+
+    def test_follow_button_costs_one_query(self):
+        """Кнопка подписки — единственный запрос: сессия и пользователь
+        берутся из кэша."""
+        url = reverse('posts:profile', args=(self.user.username,))
+        self.shell(url)
+        self.reader_client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.reader_client.get(url)
+        self.assertContains(response, 'Отписаться')
+        self.assertEqual(len(queries), 1)
+
+    def test_shell_answers_conditional_get(self):
+        """Заполненная оболочка отвечает 304 на свой ETag."""
+        url = reverse('posts:index')
+        self.shell(url)
+        response = self.reader_client.get(url)
+        response = self.reader_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post, User
+from ..templatetags.post_cards import card_key, post_cards
+
+
+class PostCardsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        cls.other = Post.objects.create(author=cls.user, text='Другой пост')
+
+    def setUp(self):
+        cache.clear()
+        self.author = Client()
+        self.author.force_login(self.user)
+
+    def test_cards_are_cached(self):
+        """Карточки кэшируются по id и времени изменения поста."""
+        cards = post_cards([self.post, self.other])
+        self.assertIn('Тестовый пост', cards[0])
+        self.assertEqual(cache.get(card_key(self.post)), cards[0])
+
+    def test_cached_cards_are_not_rendered_again(self):
+        """Карточка из кэша не отрисовывается повторно."""
+        post_cards([self.post])
+        cache.set(card_key(self.post), 'из кэша')
+        self.assertEqual(post_cards([self.post]), ['из кэша'])
+
+    def test_edit_invalidates_only_edited_card(self):
+        """Редактирование меняет ключ только у изменённого поста."""
+        post_cards([self.post, self.other])
+        other_key = card_key(self.other)
+        old_key = card_key(self.post)
+        self.author.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+            data={'text': 'Изменённый пост'}
+        )
+        self.post.refresh_from_db()
+        self.assertNotEqual(card_key(self.post), old_key)
+        self.assertIsNotNone(cache.get(other_key))
+        response = self.author.get(reverse('posts:index'))
+        self.assertContains(response, 'Изменённый пост')
+
+    def test_rename_changes_cards(self):
+        """Смена адреса группы и имени автора видна в карточках."""
+        group = Group.objects.create(
+            title='Группа', slug='old-slug', description='Описание'
+        )
+        Post.objects.create(author=self.user, text='Пост в группе',
+                            group=group)
+        guest = Client()
+        guest.get(reverse('posts:index'))
+        self.author.get(reverse('posts:index'))
+        group.slug = 'new-slug'
+        group.save()
+        self.user.first_name = 'Новое'
+        self.user.last_name = 'Имя'
+        self.user.save()
+        for client in (guest, self.author):
+            response = client.get(reverse('posts:index'))
+            self.assertContains(
+                response, reverse('posts:group_posts', args=('new-slug',))
+            )
+            self.assertNotContains(response, 'old-slug')
+            self.assertContains(response, 'Новое Имя')
+        response = guest.get(reverse('posts:profile', args=('auth',)))
+        self.assertContains(response, 'Новое Имя')
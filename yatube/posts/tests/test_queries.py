@@ -0,0 +1,106 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import sessions
+
+from ..models import Comment, Follow, Group, Post, User
+from ..paginators import CursorPaginator
+
+
+class QueryCountTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+        # Сессия должна пережить очистку кэша перед каждым замером.
+        sessions.flush()
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        return len(queries)
+
+    def test_form_pages_do_not_open_transaction(self):
+        """GET форм не открывает транзакцию: блокировка записи SQLite
+        не держится, пока рисуется страница."""
+        self.client.force_login(self.user)
+        urls = (
+            reverse('posts:post_create'),
+            reverse('posts:post_edit', args=(self.post.id,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(url)
+                self.assertFalse([
+                    query for query in queries.captured_queries
+                    if query['sql'].startswith('SAVEPOINT')
+                ])
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        """Число запросов ленты не растёт вместе с числом постов."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.user.username,)),
+            reverse('posts:follow_index'),
+        )
+        few = [self.count_queries(url) for url in urls]
+        for i in range(9):
+            author = User.objects.create_user(username=f'author{i}')
+            Follow.objects.create(user=self.reader, author=author)
+            Post.objects.create(author=author, text='Пост', group=self.group)
+            Post.objects.create(author=self.user, text='Пост')
+        many = [self.count_queries(url) for url in urls]
+        self.assertEqual(few, many)
+
+    def test_detail_queries_do_not_depend_on_comments(self):
+        """Число запросов страницы поста не зависит от комментариев."""
+        url = reverse('posts:post_detail', args=(self.post.id,))
+        Comment.objects.create(post=self.post, author=self.user, text='1')
+        few = self.count_queries(url)
+        for i in range(5):
+            author = User.objects.create_user(username=f'commenter{i}')
+            Comment.objects.create(post=self.post, author=author, text='2')
+        self.assertEqual(self.count_queries(url), few)
+
+    def test_cursor_pages_seek_by_index(self):
+        """Страница по курсору в группе и профиле читается по индексу,
+        без сортировки во временном B-дереве."""
+        querysets = (
+            Post.objects.filter(group=self.group),
+            Post.objects.filter(author=self.user),
+        )
+        for queryset in querysets:
+            for backwards in (False, True):
+                paginator = CursorPaginator(queryset.for_feed(), 10)
+                page = paginator.get_page(
+                    cursor=paginator.encode_cursor(self.post, backwards)
+                )
+                with CaptureQueriesContext(connection) as queries:
+                    list(page.object_list)
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'EXPLAIN QUERY PLAN ' + queries[0]['sql']
+                    )
+                    plan = ' '.join(row[-1] for row in cursor.fetchall())
+                self.assertIn('USING INDEX', plan)
+                self.assertNotIn('TEMP B-TREE', plan)
@@ -0,0 +1,135 @@
+from io import StringIO
+from urllib.parse import quote
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import tasks
+from ..models import Group, Post, SearchTerm, User
+from ..search import find_posts
+from ..stemmer import stem
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Путешествия',
+            slug='travel',
+            description='Тестовое описание'
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def found(self, query):
+        return set(find_posts(query))
+
+    def test_stem_merges_word_forms(self):
+        """Формы одного слова приводятся к одной основе."""
+        self.assertEqual(stem('книги'), stem('книгой'))
+        self.assertEqual(stem('читать'), stem('читал'))
+        self.assertEqual(stem('Ёлка'), stem('елки'))
+
+    def test_find_by_word_forms_and_group(self):
+        """Поиск учитывает формы слов, все слова запроса и группу."""
+        books = Post.objects.create(
+            author=self.user, text='Читаю интересные книги', group=self.group
+        )
+        cats = Post.objects.create(author=self.user, text='Кошки и книга')
+        tasks.run()
+        self.assertEqual(self.found('книгой'), {books, cats})
+        self.assertEqual(self.found('интересная книга'), {books})
+        self.assertEqual(self.found('путешествие'), {books})
+        self.assertEqual(self.found('собака'), set())
+        self.assertEqual(self.found('и'), set())
+
+    def test_index_follows_changes(self):
+        """Правка и удаление поста, переименование группы меняют индекс."""
+        post = Post.objects.create(
+            author=self.user, text='Старый текст', group=self.group
+        )
+        post.text = 'Новый текст'
+        post.save()
+        tasks.run()
+        self.assertEqual(self.found('старый'), set())
+        self.assertEqual(self.found('новый'), {post})
+        self.group.title = 'Прогулки'
+        self.group.save()
+        tasks.run()
+        self.assertEqual(self.found('путешествия'), set())
+        self.assertEqual(self.found('прогулка'), {post})
+        post.delete()
+        self.assertFalse(SearchTerm.objects.exists())
+
+    def test_group_change_reindexes_posts_in_task(self):
+        """Название группы переиндексирует её посты задачей, правка
+        описания индекс не трогает, удаление группы — тоже задачей."""
+        group = Group.objects.create(
+            title='Путешествия', slug='trips', description='Описание'
+        )
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост {number}', group=group)
+            for number in range(20)
+        )
+        call_command('rebuild_search_index', stdout=StringIO())
+        group.description = 'Новое описание'
+        with CaptureQueriesContext(connection) as queries:
+            group.save()
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if 'posts_searchterm' in query['sql']
+            or 'core_task' in query['sql']
+        ])
+        group.title = 'Прогулки'
+        with CaptureQueriesContext(connection) as queries:
+            group.save()
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if 'posts_searchterm' in query['sql']
+        ])
+        tasks.run()
+        self.assertEqual(len(self.found('прогулка')), 20)
+        self.assertEqual(self.found('путешествия'), set())
+        group.delete()
+        self.assertEqual(len(self.found('прогулка')), 20)
+        tasks.run()
+        self.assertEqual(self.found('прогулка'), set())
+        self.assertEqual(len(self.found('пост')), 20)
+
+    def test_search_page_paginates_by_cursor(self):
+        """Страница поиска делится курсором и сохраняет запрос в ссылках."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Поиск номер {number}')
+            for number in range(13)
+        )
+        call_command('rebuild_search_index', stdout=StringIO())
+        response = self.client.get(reverse('posts:search'), {'q': 'поиск'})
+        self.assertEqual(len(response.context['page_obj']), 10)
+        cursor = response.context['page_obj'].paginator.next_cursor
+        self.assertContains(
+            response, f'?q={quote("поиск")}&cursor={cursor}'
+        )
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'поиск', 'cursor': cursor}
+        )
+        self.assertEqual(len(response.context['page_obj']), 3)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке ищет по индексу, а не по подстроке."""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        post = Post.objects.create(author=self.user, text='Красивые горы')
+        Post.objects.create(author=self.user, text='Горячий чай')
+        tasks.run()
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'гора'}
+        )
+        self.assertEqual(list(response.context['cl'].result_list), [post])
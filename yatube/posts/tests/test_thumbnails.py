@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from core import tasks
+from ..models import Post, User
+from ..templatetags.post_cards import post_cards
+from ..thumbnails import generate_batch, media_images
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, TASKS_EAGER=True)
+class ThumbnailTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name='small.gif'):
+        user, _ = User.objects.get_or_create(username='auth')
+        return Post.objects.create(
+            author=user,
+            text='Тестовый пост',
+            image=SimpleUploadedFile(name, SMALL_GIF, 'image/gif')
+        )
+
+    def test_upload_generates_thumbnails(self):
+        """После сохранения поста эскизы уже созданы и учтены."""
+        post = self.create_post()
+        source = default.kvstore.get(ImageFile(post.image.name))
+        self.assertIsNotNone(source)
+        thumbnails = default.kvstore._get(source.key, identity='thumbnails')
+        self.assertEqual(
+            len(thumbnails), len(settings.THUMBNAIL_GEOMETRIES)
+        )
+
+    def test_batch_reports_only_failed_files(self):
+        """Ошибка одного файла не останавливает пачку и возвращает на
+        повтор только его."""
+        generated = []
+
+        def generate(name):
+            if name == 'posts/broken.gif':
+                raise OSError('битый файл')
+            generated.append(name)
+
+        params = [{'name': 'posts/a.gif'}, {'name': 'posts/broken.gif'},
+                  {'name': 'posts/b.gif'}]
+        with mock.patch('posts.thumbnails.generate', generate):
+            with self.assertRaises(tasks.PartialFailure) as failure:
+                generate_batch(params)
+        self.assertEqual(generated, ['posts/a.gif', 'posts/b.gif'])
+        self.assertEqual(failure.exception.failed, [params[1]])
+
+    def test_media_images_lists_uploaded_files(self):
+        """Команда дозаполнения видит файлы из MEDIA_ROOT/posts/."""
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'posts'), exist_ok=True)
+        with open(os.path.join(TEMP_MEDIA_ROOT, 'posts', 'a.gif'), 'wb') as f:
+            f.write(SMALL_GIF)
+        self.assertIn('posts/a.gif', list(media_images()))
+
+    def test_thumbnail_file_matches_get_thumbnail(self):
+        """Ключ эскиза вычисляется так же, как в get_thumbnail."""
+        post = self.create_post()
+        geometry, options = settings.THUMBNAIL_GEOMETRIES[0]
+        self.assertEqual(
+            default.backend.thumbnail_file(
+                post.image, geometry, **options
+            ).key,
+            get_thumbnail(post.image, geometry, **options).key
+        )
+
+    def test_cards_read_thumbnails_in_one_query(self):
+        """Эскизы всех карточек страницы читаются одним запросом."""
+        for number in range(3):
+            self.create_post(f'small{number}.gif')
+        posts = list(Post.objects.for_feed())
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            cards = post_cards(posts)
+        kvstore = [
+            query for query in queries.captured_queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(kvstore), 1)
+        for card in cards:
+            self.assertIn('<img class="card-img', card)
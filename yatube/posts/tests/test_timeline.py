@@ -0,0 +1,133 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from core import tasks
+from .. import timeline
+from ..models import Follow, Post, Timeline, User
+from ..paginators import CursorPaginator
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.post = Post.objects.create(author=cls.author, text='Старый пост')
+
+    def test_follow_backfills_timeline(self):
+        """Подписка добавляет в ленту уже опубликованные посты автора."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertTrue(
+            Timeline.objects.filter(user=self.reader, post=self.post).exists()
+        )
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает в ленты подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertIn(post, timeline.get_feed(self.reader))
+
+    @override_settings(TIMELINE_INLINE_ROWS=0)
+    def test_large_fan_out_is_queued(self):
+        """Раскладка на много подписчиков идёт задачей."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(Timeline.objects.filter(post=post).exists())
+        tasks.run()
+        self.assertIn(post, timeline.get_feed(self.reader))
+
+    @override_settings(TIMELINE_INLINE_ROWS=1)
+    def test_large_backfill_is_queued(self):
+        """Сразу раскладываются последние посты, остальные — задачей,
+        пока подписка есть."""
+        new = Post.objects.create(author=self.author, text='Новый пост')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(list(timeline.get_feed(self.reader)), [new])
+        tasks.run()
+        self.assertEqual(timeline.get_feed(self.reader).count(), 2)
+        follow.delete()
+        Follow.objects.create(user=self.reader, author=self.author).delete()
+        tasks.run()
+        self.assertFalse(Timeline.objects.filter(user=self.reader).exists())
+
+    def test_unfollow_trims_timeline(self):
+        """Отписка убирает посты автора из ленты."""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        follow.delete()
+        self.assertFalse(Timeline.objects.filter(user=self.reader).exists())
+        self.assertFalse(timeline.get_feed(self.reader).exists())
+
+    @override_settings(TIMELINE_CELEBRITY_FOLLOWERS=1)
+    def test_celebrity_posts_are_pulled(self):
+        """Посты популярных авторов читаются без раскладки по лентам."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(Timeline.objects.filter(post=post).exists())
+        self.assertIn(post, timeline.get_feed(self.reader))
+        self.assertIn(self.post, timeline.get_feed(self.reader))
+
+    def test_rebuild_skips_existing_entries(self):
+        """Дозаполнение новыми постами пропускает уже разложенные."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        timeline.rebuild(new_posts=Post.objects.filter(pk=post.pk))
+        self.assertEqual(
+            Timeline.objects.filter(user=self.reader, post=post).count(), 1
+        )
+
+    @override_settings(TIMELINE_CELEBRITY_FOLLOWERS=4)
+    def test_posts_survive_leaving_celebrity_status(self):
+        """Пост, написанный знаменитостью, остаётся в лентах, когда
+        подписчиков снова мало, и виден новым подписчикам."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        for number in range(3):
+            Follow.objects.create(
+                user=User.objects.create_user(username=f'fan{number}'),
+                author=self.author
+            )
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(Timeline.objects.filter(post=post).exists())
+        Follow.objects.filter(user__username='fan0').delete()
+        self.assertIn(post, timeline.get_feed(self.reader))
+        # Подписчиков вдвое меньше порога: посты раскладывает задача.
+        Follow.objects.filter(user__username__in=('fan1', 'fan2')).delete()
+        self.assertFalse(timeline.is_celebrity(self.author.pk))
+        self.assertFalse(
+            Timeline.objects.filter(user=self.reader, post=post).exists()
+        )
+        tasks.run()
+        self.assertTrue(
+            Timeline.objects.filter(user=self.reader, post=post).exists()
+        )
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=other, author=self.author)
+        self.assertIn(post, timeline.get_feed(other))
+
+    def test_feed_pages_by_timeline_index(self):
+        """Страница ленты — диапазон индекса записей ленты без
+        сортировки, курсор продолжает ленту без пропусков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        for number in range(3):
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+        feed = timeline.get_feed(self.reader)
+        paginator = CursorPaginator(
+            feed, 2, key='feed_date', tiebreak='feed_post'
+        )
+        first = list(paginator.get_page())
+        following = CursorPaginator(
+            feed, 2, key='feed_date', tiebreak='feed_post'
+        )
+        page = following.get_page(cursor=paginator.next_cursor)
+        with CaptureQueriesContext(connection) as queries:
+            second = list(page)
+        self.assertEqual(
+            first + second,
+            list(Post.objects.order_by('-pub_date', '-id'))
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + queries[0]['sql'])
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('posts_timeline USING COVERING INDEX', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
@@ -42,6 +42,7 @@ class PostPagesTests(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -172,7 +173,7 @@ class PostPagesTests(TestCase):
         """Тестирование кэша."""
         response = self.guest_client.get(reverse("posts:index"))
         response_1 = response.content
-        Post.objects.get(id=self.post.id).delete()
+        Post.objects.filter(id=self.post.id).update(text='Без сигналов')
         response2 = self.guest_client.get(reverse("posts:index"))
         response_2 = response2.content
         self.assertEqual(response_1, response_2)
@@ -181,6 +182,31 @@ class PostPagesTests(TestCase):
         response_3 = response3.content
         self.assertNotEqual(response_2, response_3)
 
+    def test_cache_index_invalidated_on_write(self):
+        """Удаление поста сразу сбрасывает кэш главной страницы."""
+        response_1 = self.guest_client.get(reverse("posts:index")).content
+        Post.objects.get(id=self.post.id).delete()
+        response_2 = self.guest_client.get(reverse("posts:index")).content
+        self.assertNotEqual(response_1, response_2)
+
+    def test_cached_index_skips_feed_query(self):
+        """Закэшированная лента не обращается к базе."""
+        self.guest_client.get(reverse("posts:index"))
+        with self.assertNumQueries(0):
+            self.guest_client.get(reverse("posts:index"))
+
+    def test_cache_index_varies_by_page(self):
+        """Разные страницы ленты кэшируются отдельно."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост {i}') for i in range(10)
+        )
+        cache.clear()
+        response_1 = self.guest_client.get(reverse("posts:index")).content
+        response_2 = self.guest_client.get(
+            reverse("posts:index") + '?page=2'
+        ).content
+        self.assertNotEqual(response_1, response_2)
+
     def test_follow_page(self):
         """Авторизованный пользователь может подписываться
         на других пользователей и отписываться."""
@@ -262,6 +288,7 @@ class PaginatorViewsTest(TestCase):
         Post.objects.bulk_create(objs=posts)
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.author = Client()
         self.author.force_login(self.user)
@@ -275,3 +302,31 @@ class PaginatorViewsTest(TestCase):
         """Паджинатор тест страницы 2."""
         response = self.author.get(reverse('posts:index') + '?page=2')
         self.assertEqual(len(response.context['page_obj']), 4)
+
+    def test_next_cursor_continues_first_page(self):
+        """Курсор первой страницы ведёт на оставшиеся записи."""
+        response = self.author.get(reverse('posts:index'))
+        cursor = response.context['page_obj'].paginator.next_cursor
+        response = self.author.get(reverse('posts:index'), {'cursor': cursor})
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), 4)
+        self.assertIsNone(page_obj.paginator.next_cursor)
+
+    def test_previous_cursor_returns_first_page(self):
+        """Курсор назад возвращает ровно первую страницу."""
+        first = self.author.get(reverse('posts:index')).context['page_obj']
+        second = self.author.get(
+            reverse('posts:index'), {'cursor': first.paginator.next_cursor}
+        ).context['page_obj']
+        response = self.author.get(
+            reverse('posts:index'),
+            {'cursor': second.paginator.previous_cursor}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(list(page_obj), list(first))
+        self.assertIsNone(page_obj.paginator.previous_cursor)
+
+    def test_invalid_cursor_shows_first_page(self):
+        """Испорченный курсор не ломает страницу."""
+        response = self.author.get(reverse('posts:index'), {'cursor': '!!'})
+        self.assertEqual(len(response.context['page_obj']), 10)
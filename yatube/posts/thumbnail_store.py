@@ -0,0 +1,92 @@
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend as BaseThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (EMPTY_VALUE,
+                                                       KVStore as DBKVStore)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+_local = threading.local()
+
+
+class ThumbnailBackend(BaseThumbnailBackend):
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """Файл эскиза, который вернёт get_thumbnail с теми же
+        аргументами, но без обращений к хранилищу."""
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+
+class KVStore(DBKVStore):
+    """cached_db хранилище, которое сначала смотрит в предзагруженные
+    для страницы значения."""
+
+    def get_many_raw(self, keys):
+        values = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in values]
+        if missing:
+            found = dict(
+                KVStoreModel.objects.filter(
+                    key__in=missing
+                ).values_list('key', 'value')
+            )
+            fill = {key: found.get(key, EMPTY_VALUE) for key in missing}
+            self.cache.set_many(fill, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+            values.update(fill)
+        return values
+
+    def _get_raw(self, key):
+        values = getattr(_local, 'values', None)
+        if values is None or key not in values:
+            return super()._get_raw(key)
+        if values[key] == EMPTY_VALUE:
+            return None
+        return values[key]
+
+    def _set_raw(self, key, value):
+        self._forget(key)
+        super()._set_raw(key, value)
+
+    def _delete_raw(self, *keys):
+        self._forget(*keys)
+        super()._delete_raw(*keys)
+
+    def _forget(self, *keys):
+        values = getattr(_local, 'values', None)
+        if values is not None:
+            for key in keys:
+                values.pop(key, None)
+
+
+@contextmanager
+def preloaded(images):
+    """Метаданные эскизов всех картинок читаются одним get_many,
+    теги {% thumbnail %} внутри блока берут их из памяти."""
+    keys = [
+        add_prefix(
+            default.backend.thumbnail_file(image, geometry, **options).key
+        )
+        for image in images if image
+        for geometry, options in settings.THUMBNAIL_GEOMETRIES
+    ]
+    previous = getattr(_local, 'values', None)
+    _local.values = default.kvstore.get_many_raw(keys) if keys else {}
+    try:
+        yield
+    finally:
+        _local.values = previous
@@ -0,0 +1,78 @@
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+from core import metrics, tasks
+
+logger = logging.getLogger(__name__)
+
+
+def _init_worker():
+    import django
+    django.setup()
+    # Подключения родительского процесса в дочернем не используются.
+    connections.close_all()
+
+
+def generate(name):
+    """Создаёт эскизы всех размеров из THUMBNAIL_GEOMETRIES для файла."""
+    from sorl.thumbnail import get_thumbnail
+    started = time.perf_counter()
+    for geometry, options in settings.THUMBNAIL_GEOMETRIES:
+        get_thumbnail(name, geometry, **options)
+    metrics.observe(
+        'yatube_thumbnail_seconds', time.perf_counter() - started
+    )
+
+
+def _generate_safely(name):
+    try:
+        generate(name)
+    except Exception:
+        logger.exception('Не удалось создать эскизы для %s', name)
+        return False
+    return True
+
+
+@tasks.task('posts.thumbnails', batch_size=16)
+def generate_batch(params):
+    """Ошибка одного файла не мешает остальным: повторяются только
+    задачи файлов, для которых эскизы не создались."""
+    failed = []
+    for item in params:
+        try:
+            generate(item['name'])
+        except Exception as error:
+            logger.exception('Не удалось создать эскизы для %s', item['name'])
+            failed.append(item)
+            last_error = error
+    if failed:
+        raise tasks.PartialFailure(failed, last_error)
+
+
+def enqueue(name):
+    """Ставит создание эскизов фоновой задачей core.tasks."""
+    tasks.enqueue('posts.thumbnails', {'name': name}, key=f'thumbnails:{name}')
+
+
+def generate_many(names, workers=None):
+    """Создаёт эскизы для многих файлов, возвращает число успешных."""
+    with ProcessPoolExecutor(
+        max_workers=workers or settings.THUMBNAIL_WORKERS or 1,
+        initializer=_init_worker,
+    ) as pool:
+        return sum(pool.map(_generate_safely, names, chunksize=16))
+
+
+def media_images(directory='posts'):
+    """Имена файлов из MEDIA_ROOT/<directory>/ относительно хранилища."""
+    root = os.path.join(settings.MEDIA_ROOT, directory)
+    if not os.path.isdir(root):
+        return
+    for entry in os.scandir(root):
+        if entry.is_file():
+            yield f'{directory}/{entry.name}'
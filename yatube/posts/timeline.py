@@ -0,0 +1,185 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+
+from core import tasks
+from . import cache
+from .models import Follow, Post, Profile, Timeline
+
+
+def is_celebrity(author_id):
+    """Посты популярных авторов не раскладываются по лентам."""
+    return Profile.objects.filter(user_id=author_id, celebrity=True).exists()
+
+
+def update_celebrity(author_id):
+    """Переключает автора между раскладкой постов по лентам и чтением
+    при показе ленты, когда число подписчиков переходит порог.
+
+    Выбор хранится в профиле, а не считается по текущему числу
+    подписчиков: посты, написанные знаменитостью, есть только в её
+    постах, и лента должна читать их оттуда, пока автор не вернётся
+    к раскладке. Возвращаясь, автор ставит задачу core.tasks, которая
+    раскладывает все его посты по лентам подписчиков: до неё лента
+    подписчика не видит постов, написанных в статусе знаменитости.
+    Обратно автор переходит, когда подписчиков вдвое меньше порога,
+    чтобы не переключаться туда и обратно у самой границы.
+    Возвращает, знаменитость ли автор теперь.
+    """
+    threshold = settings.TIMELINE_CELEBRITY_FOLLOWERS
+    profile = Profile.objects.filter(user_id=author_id).values_list(
+        'celebrity', 'followers_count'
+    ).first()
+    if profile is None:
+        return False
+    celebrity, followers = profile
+    if not celebrity and followers >= threshold:
+        Profile.objects.filter(user_id=author_id).update(celebrity=True)
+        return True
+    if celebrity and followers < threshold // 2:
+        Profile.objects.filter(user_id=author_id).update(celebrity=False)
+        tasks.enqueue('posts.backfill', {'author_id': author_id})
+        return False
+    return celebrity
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора.
+
+    Подписчиков не больше TIMELINE_INLINE_ROWS — сразу, одним
+    INSERT … SELECT; больше — задачей core.tasks."""
+    celebrity, followers = Profile.objects.filter(
+        user_id=post.author_id
+    ).values_list('celebrity', 'followers_count').first() or (False, 0)
+    if celebrity:
+        return
+    if followers > settings.TIMELINE_INLINE_ROWS:
+        tasks.enqueue('posts.fan_out', {'post_id': post.pk})
+    else:
+        _insert(Follow.objects.filter(
+            author_id=post.author_id, author__posts__id=post.pk
+        ))
+
+
+@tasks.task('posts.fan_out', batch_size=100)
+def fan_out_batch(params):
+    """Раскладывает пачку новых постов одним INSERT … SELECT. Посты
+    знаменитостей не раскладываются; посты, удалённые до задачи, и
+    подписки, отменённые до неё, не попадают в ленты."""
+    rebuild(new_posts=Post.objects.filter(
+        id__in=[item['post_id'] for item in params]
+    ))
+    # Ленты, отрисованные до раскладки, устарели.
+    cache.bump('posts')
+
+
+def backfill(user_id, author_id):
+    """Заполняет ленту подписчика постами автора после подписки.
+
+    Сразу раскладываются TIMELINE_INLINE_ROWS последних постов — первые
+    страницы ленты; остальные, если они есть, — задачей core.tasks.
+    Посты знаменитостей не раскладываются, см. update_celebrity."""
+    limit = settings.TIMELINE_INLINE_ROWS
+    inserted = limit and _insert(Follow.objects.filter(
+        user_id=user_id, author_id=author_id, author__posts__isnull=False
+    ).order_by('-author__posts__pub_date')[:limit])
+    if inserted >= limit:
+        tasks.enqueue('posts.backfill', {
+            'user_id': user_id, 'author_id': author_id
+        })
+
+
+@tasks.task('posts.backfill', batch_size=100)
+def backfill_batch(params):
+    """Раскладывает все посты авторов по лентам подписчиков, чьи
+    подписки ещё есть: одного подписчика или, без user_id, всех."""
+    celebrities = Profile.objects.filter(celebrity=True).values('user_id')
+    for item in params:
+        follows = Follow.objects.filter(
+            author_id=item['author_id'], author__posts__isnull=False
+        )
+        if 'user_id' in item:
+            follows = follows.filter(user_id=item['user_id'])
+        _insert(follows.exclude(author_id__in=celebrities))
+        cache.bump(
+            f'follow:{item["user_id"]}' if 'user_id' in item else 'posts'
+        )
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    Timeline.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def followed_celebrities(user):
+    return list(
+        Follow.objects.filter(
+            user=user, author__profile__celebrity=True
+        ).values_list('author_id', flat=True)
+    )
+
+
+def get_feed(user):
+    """Лента подписок: материализованные записи плюс посты знаменитостей.
+
+    Лента разбивается на страницы по (feed_date, feed_post) — дате и id
+    поста. Без знаменитостей это столбцы записи ленты, и страница
+    читается диапазоном индекса (user, -pub_date, -post); посты
+    знаменитостей добавляются условием на посты в порядке их даты.
+    """
+    celebrities = followed_celebrities(user)
+    if not celebrities:
+        return Post.objects.filter(timeline_entries__user=user).annotate(
+            feed_date=F('timeline_entries__pub_date'),
+            feed_post=F('timeline_entries__post'),
+        )
+    return Post.objects.filter(
+        Q(id__in=Timeline.objects.filter(user=user).values('post_id'))
+        | Q(author_id__in=celebrities)
+    ).annotate(feed_date=F('pub_date'), feed_post=F('id'))
+
+
+def rebuild(new_posts=None):
+    """Заполняет ленты заново по всем подпискам, например после
+    bulk_create, минуя сигналы. Записи вставляются одним
+    INSERT … SELECT, без загрузки в Python. С new_posts раскладываются
+    только эти посты, остальные записи не трогаются."""
+    if new_posts is None:
+        Timeline.objects.all().delete()
+        threshold = settings.TIMELINE_CELEBRITY_FOLLOWERS
+        Profile.objects.filter(followers_count__gte=threshold).update(
+            celebrity=True
+        )
+        Profile.objects.filter(followers_count__lt=threshold).update(
+            celebrity=False
+        )
+    celebrities = Profile.objects.filter(celebrity=True).values('user_id')
+    # Оба условия на посты в одном filter, чтобы был один JOIN.
+    posts = {'author__posts__isnull': False}
+    if new_posts is not None:
+        posts['author__posts__in'] = new_posts
+    _insert(Follow.objects.exclude(
+        author_id__in=celebrities
+    ).filter(**posts))
+
+
+def _insert(follows):
+    """Раскладывает посты авторов подписок follows по лентам одним
+    INSERT … SELECT; возвращает число новых записей. Уже разложенные
+    посты пропускаются: их могли добавить сигналы, пока шла загрузка."""
+    rows = follows.values_list(
+        'user_id', 'author__posts__id', 'author_id', 'author__posts__pub_date'
+    )
+    select, params = rows.query.sql_with_params()
+    columns = ', '.join(
+        connection.ops.quote_name(Timeline._meta.get_field(name).column)
+        for name in ('user', 'post', 'author', 'pub_date')
+    )
+    table = connection.ops.quote_name(Timeline._meta.db_table)
+    insert = connection.ops.insert_statement(ignore_conflicts=True)
+    suffix = connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{insert} {table} ({columns}) {select} {suffix}', params
+        )
+        return cursor.rowcount
@@ -4,14 +4,44 @@ from . import views
 
 app_name = 'posts'
 
+# Бюджеты на запрос: (число SQL-запросов, суммарное время SQL в мс).
+query_budgets = {
+    'index': (4, 500),
+    'group_posts': (5, 500),
+    'profile': (6, 500),
+    # Запросы архива идут при отдаче ответа и сюда не входят.
+    'profile_export': (2, 500),
+    'post_detail': (5, 500),
+    'post_comments': (3, 500),
+    'search': (5, 500),
+    # Пост с картинкой ставит задачу эскизов (core.tasks).
+    'post_create': (11, 500),
+    'post_edit': (13, 500),
+    'add_comment': (7, 500),
+    'follow_index': (5, 500),
+    'profile_follow': (11, 500),
+    'profile_unfollow': (9, 500),
+}
+
 
 urlpatterns = [
     path('', views.index, name='index'),
     path('group/<slug:slug>/', views.group_posts, name='group_posts'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path(
+        'profile/<str:username>/export/',
+        views.profile_export,
+        name='profile_export'
+    ),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('search/', views.search, name='search'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment,
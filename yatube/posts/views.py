@@ -1,71 +1,148 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
+from core.conditional import conditional
+from core.holes import shared_page
+from core.page_cache import tag
+from core.routers import replica_reads
 from posts.forms import CommentForm, PostForm
+from . import archive, counters, freshness, timeline
+from .cache import feed_version
 from .models import Comment, Follow, Group, Post, User
+from .paginators import paginate
+from .search import find_posts
 
 MAX_POSTS: int = 10
+MAX_COMMENTS: int = 20
 
 
+@replica_reads
+@shared_page
+@conditional(freshness.feed)
 def index(request):
-    posts = Post.objects.all()
-    paginator = Paginator(posts, MAX_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = Post.objects.for_feed()
+    page_obj = paginate(request, posts, MAX_POSTS)
     context = {
         'page_obj': page_obj,
+        'feed_version': feed_version('posts'),
     }
-    return render(
-        request, 'posts/index.html', context
-    )
+    return tag(render(request, 'posts/index.html', context), 'feed')
 
 
+@replica_reads
+@shared_page
+@conditional(freshness.feed)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, MAX_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = group.posts.for_feed()
+    page_obj = paginate(request, posts, MAX_POSTS, count=group.posts_count)
     context = {
         'group': group,
         'page_obj': page_obj,
+        'feed_version': feed_version('posts'),
     }
-    return render(
-        request, 'posts/group_list.html', context
+    return tag(
+        render(request, 'posts/group_list.html', context),
+        f'group-{group.pk}'
     )
 
 
+@replica_reads
+@shared_page
+@conditional(freshness.profile)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    posts_count = posts.count()
-    paginator = Paginator(posts, MAX_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    following = author.following.filter(user=request.user.id).exists()
+    author = get_object_or_404(
+        User.objects.select_related('profile'), username=username
+    )
+    posts = author.posts.for_feed()
+    posts_count = counters.get_profile(author).posts_count
+    page_obj = paginate(request, posts, MAX_POSTS, count=posts_count)
     context = {
         'author': author,
         'page_obj': page_obj,
         'posts_count': posts_count,
-        "following": following,
+        'feed_version': feed_version('posts'),
+    }
+    return tag(
+        render(request, 'posts/profile.html', context),
+        f'author-{author.pk}'
+    )
+
+
+@login_required
+def profile_export(request, username):
+    if username != request.user.username:
+        raise PermissionDenied
+    # Архив собирается при отдаче, после выхода из представления.
+    response = StreamingHttpResponse(
+        archive.user_archive(request.user), content_type='application/zip'
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="yatube-{username}.zip"'
+    )
+    return response
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    posts = find_posts(query).for_feed()
+    page_obj = paginate(request, posts, MAX_POSTS, key='found_date')
+    context = {
+        'query': query,
+        'page_obj': page_obj,
     }
-    return render(request, 'posts/profile.html', context)
+    return render(request, 'posts/search.html', context)
 
 
+@replica_reads
+@shared_page
+@conditional(freshness.post)
 def post_detail(request, post_id):
-    form = CommentForm(request.POST or None)
-    post = get_object_or_404(Post, id=post_id)
-    comments = Comment.objects.filter(post=post)
-    count = post.author.posts.count()
+    post = get_object_or_404(Post.objects.for_detail(), id=post_id)
+    comments = paginate(
+        request,
+        post.comments.select_related('author'),
+        MAX_COMMENTS,
+        key='created'
+    )
+    count = counters.get_profile(post.author).posts_count
     context = {
         'post': post,
         'count': count,
-        'form': form,
         'comments': comments
 
     }
-    return render(request, 'posts/post_detail.html', context)
+    response = render(request, 'posts/post_detail.html', context)
+    tag(response, f'post-{post.pk}', f'author-{post.author_id}')
+    if post.group_id is not None:
+        tag(response, f'group-{post.group_id}')
+    return response
+
+
+@replica_reads
+def post_comments(request, post_id):
+    """Следующая страница комментариев фрагментом HTML."""
+    comments = paginate(
+        request,
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        MAX_COMMENTS,
+        key='created'
+    )
+    # Пост проверяется, только когда комментариев нет: у непустой
+    # страницы он точно есть.
+    if not comments and not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    context = {
+        'post_id': post_id,
+        'comments': comments,
+    }
+    return tag(
+        render(request, 'includes/comment_list.html', context),
+        f'post-{post_id}'
+    )
 
 
 @login_required
@@ -78,7 +155,10 @@ def post_create(request):
         if form.is_valid():
             post = form.save(commit=False)
             post.author = request.user
-            post.save()
+            # Пост и его счётчики записываются вместе; форма
+            # рисуется вне транзакции.
+            with transaction.atomic():
+                post.save()
             return redirect('posts:profile', username=request.user)
         return render(request, 'posts/create_post.html', {'form': form})
     return render(request, 'posts/create_post.html', {'form': form})
@@ -87,7 +167,7 @@ def post_create(request):
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
-    if post.author != request.user:
+    if post.author_id != request.user.id:
         return redirect('posts:post_detail', post_id=post_id)
     form = PostForm(
         request.POST or None,
@@ -96,7 +176,8 @@ def post_edit(request, post_id):
     )
     if request.method == 'POST':
         if form.is_valid():
-            form.save()
+            with transaction.atomic():
+                form.save()
             return redirect('posts:post_detail', post_id=post_id)
     context = {
         'form': form,
@@ -114,22 +195,23 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@replica_reads
 @login_required
+@conditional(freshness.follow)
 def follow_index(request):
-    follower = Follow.objects.filter(user=request.user).values_list(
-        "author_id", flat=True
+    posts = timeline.get_feed(request.user).for_feed()
+    page_obj = paginate(
+        request, posts, MAX_POSTS, key='feed_date', tiebreak='feed_post'
     )
-    posts = Post.objects.filter(author_id__in=follower)
-    paginator = Paginator(posts, MAX_POSTS)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
     context = {
         "page_obj": page_obj,
         "title": "Избранные посты",
+        "feed_version": feed_version("posts", f"follow:{request.user.id}"),
     }
     return render(request, "posts/follow.html", context)
 
@@ -138,12 +220,15 @@ def follow_index(request):
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
-        Follow.objects.get_or_create(user=request.user, author=author)
+        with transaction.atomic():
+            Follow.objects.get_or_create(user=request.user, author=author)
     return redirect("posts:follow_index")
 
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    get_object_or_404(Follow, user=request.user, author=author).delete()
+    follow = get_object_or_404(Follow, user=request.user, author=author)
+    with transaction.atomic():
+        follow.delete()
     return redirect("posts:follow_index")
@@ -10,11 +10,24 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# manage.py test и pytest держат общие файлы (кэш, метрики) во
+# временном каталоге процесса, а не рядом с рабочими.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+if TESTING:
+    SHARED_FILES_DIR = tempfile.mkdtemp(prefix='yatube-test-')
+    atexit.register(shutil.rmtree, SHARED_FILES_DIR, ignore_errors=True)
+else:
+    SHARED_FILES_DIR = BASE_DIR
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
@@ -55,12 +68,18 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ProfilerMiddleware',
+    'core.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.AnonymousPageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'core.middleware.ReplicaMiddleware',
+    'core.middleware.PageShellMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
@@ -70,7 +89,8 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с замером времени отрисовки для core.metrics.
+        'BACKEND': 'core.templates.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -93,11 +113,46 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # django.db.backends.sqlite3 с BEGIN IMMEDIATE в транзакциях.
+        'ENGINE': 'core.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Подключение живёт между запросами потока.
+        'CONN_MAX_AGE': 600,
     }
 }
 
+# Реплики только для чтения — алиасы из DATABASES (core.routers). На
+# одной машине это копии db.sqlite3, которые обновляет
+# manage.py sync_replicas, например:
+# DATABASES['replica'] = {
+#     **DATABASES['default'],
+#     'NAME': os.path.join(BASE_DIR, 'replica.sqlite3'),
+#     'TEST': {'MIRROR': 'default'},
+# }
+# DATABASE_REPLICAS = ['replica']
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Сколько секунд после своей записи пользователь читает из основной
+# базы; должно быть больше отставания реплик.
+REPLICA_STICKY_SECONDS = 10
+
+# Выполняются на каждом новом подключении SQLite (core.db).
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    # В режиме WAL база не портится при сбое питания, теряются только
+    # последние транзакции.
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    # Отрицательное значение — в КиБ: 64 МиБ страниц на подключение.
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+}
+SQLITE_IMMEDIATE_TRANSACTIONS = True
+# Транзакции процесса выполняются по одному (core.db.write_queue); дольше
+# этого числа секунд поток очередь не ждёт.
+SQLITE_SERIALIZE_WRITES = True
+SQLITE_WRITE_QUEUE_TIMEOUT = 20
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -145,17 +200,105 @@ LOGIN_REDIRECT_URL = 'posts:index'
 PASSWORD_CHANGE_FORM_URL = 'posts:index'
 PASSWORD_CHANGE_DONE_URL = 'posts:index'
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# Письма отправляет фоновая задача (core.mail) бэкендом
+# TASKS_EMAIL_BACKEND.
+EMAIL_BACKEND = 'core.mail.QueuedEmailBackend'
+TASKS_EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        # L1 в памяти процесса перед общим для процессов файлом SQLite.
+        'BACKEND': 'core.cache.TwoTierCache',
+        'LOCATION': os.path.join(SHARED_FILES_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'L1_MAX_ENTRIES': 1000,
+            'POLL_INTERVAL': 1,
+        },
     }
 }
 
+# Сессии в кэше; изменённые сессии пишутся в базу пачкой не чаще раза
+# в SESSION_WRITE_BEHIND секунд (core.sessions).
+SESSION_ENGINE = 'core.sessions'
+SESSION_WRITE_BEHIND = 5
+# Сколько секунд пользователь запроса хранится в кэше (core.auth).
+AUTH_USER_CACHE_TIMEOUT = 600
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
+
+TIMELINE_CELEBRITY_FOLLOWERS = 1000
+# Сколько записей лент раскладывается прямо в запросе, чтобы подписчик
+# сразу видел пост; больше — задачей core.tasks.
+TIMELINE_INLINE_ROWS = 200
+
+SEARCH_BATCH_SIZE = 300
+SEARCH_COUNT_LIMIT = 10000
+
+# Сколько секунд хранятся страницы гостей и общие оболочки страниц
+# пользователей (core.holes); 0 отключает кэш.
+PAGE_CACHE_TIMEOUT = 600
+
+# Базовые замеры для manage.py benchmark_views.
+BENCHMARK_BASELINE = os.path.join(BASE_DIR, 'benchmark_baseline.json')
+
+# Общий для процессов файл метрик: /dev/shm держит его в памяти.
+METRICS_LOCATION = os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') and not TESTING
+    else SHARED_FILES_DIR,
+    'yatube-metrics.sqlite3'
+)
+METRICS_FLUSH_INTERVAL = 1
+# Страница /metrics/ открыта персоналу сайта и запросам с этих адресов
+# с заголовком Authorization: Bearer METRICS_TOKEN. Пустой токен — только
+# персоналу: за обратным прокси адрес у всех запросов 127.0.0.1.
+METRICS_ALLOWED_IPS = ['127.0.0.1']
+METRICS_TOKEN = ''
+
+# Статистический профилировщик (core.profiling): доля запросов к этим
+# URL и запросы с заголовком X-Profile от персонала сайта или с
+# разрешённых адресов, если заголовок равен PROFILER_TOKEN.
+PROFILER_URL_NAMES = []
+PROFILER_SAMPLE_RATE = 0.01
+PROFILER_HEADER = 'HTTP_X_PROFILE'
+PROFILER_ALLOWED_IPS = INTERNAL_IPS
+PROFILER_TOKEN = ''
+# Период снятия стеков в секундах.
+PROFILER_INTERVAL = 0.005
+PROFILER_DIR = os.path.join(BASE_DIR, 'profiles')
+
+QUERY_BUDGET_MODULES = ['posts.urls']
+QUERY_BUDGET_REPEAT_LIMIT = 3
+QUERY_BUDGET_RAISE = DEBUG
+# Эскизы, которые не успели создаться заранее, sorl-thumbnail создаёт
+# прямо в запросе; эти обращения к его хранилищу не входят в бюджет.
+QUERY_BUDGET_IGNORE = [r'"thumbnail_kvstore"']
+
+# Фоновые задачи core.tasks выполняет manage.py run_tasks. С TASKS_EAGER
+# они выполняются сразу после фиксации транзакции в том же процессе.
+TASKS_EAGER = False
+# Пауза перед повтором: TASKS_RETRY_DELAY * 2 ** (попытка - 1) секунд,
+# но не больше TASKS_RETRY_MAX_DELAY.
+TASKS_RETRY_DELAY = 10
+TASKS_RETRY_MAX_DELAY = 3600
+# Через сколько секунд задача упавшего исполнителя снова готова.
+TASKS_LOCK_TIMEOUT = 300
+# Сколько секунд хранятся выполненные задачи и их ключи.
+TASKS_RETENTION = 24 * 60 * 60
+
+# Размеры эскизов, которые создаются заранее при загрузке картинки.
+# Должны совпадать с тегами {% thumbnail %} в шаблонах.
+THUMBNAIL_GEOMETRIES = [
+    ('960x339', {'crop': 'center', 'upscale': True}),
+]
+# Процессы manage.py generate_thumbnails.
+THUMBNAIL_WORKERS = 2
+# Метаданные эскизов страницы читаются одним запросом, см.
+# posts.thumbnail_store.preloaded.
+THUMBNAIL_BACKEND = 'posts.thumbnail_store.ThumbnailBackend'
+THUMBNAIL_KVSTORE = 'posts.thumbnail_store.KVStore'